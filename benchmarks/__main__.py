@@ -0,0 +1,64 @@
+"""
+Runs every benchmark and writes the results as JSON, so results can be compared between releases.
+Benchmarks run offline on CPU with the stub encoder and tokenizer in `benchmarks.stubs`.
+
+Usage:
+    python -m benchmarks [--output results.json] [--only chain_overhead faiss_memory] [--quick]
+"""
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+from importlib import import_module
+from time import perf_counter
+import json
+import platform
+import sys
+
+BENCHMARKS = ['import_time', 'chain_overhead', 'prompt_render', 'conversation_context', 'faiss_memory', 'link_allocations']
+
+# smaller settings for a fast smoke run
+QUICK = {
+    'import_time' : {'repeat' : 2},
+    'chain_overhead' : {'depths' : (2, 10), 'widths' : (2, 8), 'number' : 200},
+    'prompt_render' : {'batch_size' : 100, 'number' : 5},
+    'conversation_context' : {'turns' : 1000, 'checkpoints' : (100, 1000)},
+    'faiss_memory' : {'sizes' : (1000, 10000), 'queries' : 64},
+    'link_allocations' : {'count' : 1000, 'widths' : (4,), 'number' : 200},
+}
+
+def versions() -> dict:
+    import lightchain
+    out = {'python' : platform.python_version(), 'lightchain' : lightchain.__version__}
+    for module in ('numpy', 'faiss', 'matchpy'):
+        try: out[module] = getattr(import_module(module), '__version__', 'unknown')
+        except ImportError: out[module] = None
+    return out
+
+def main(argv=None) -> dict:
+    parser = ArgumentParser(description='Runs the lightchain benchmarks and reports results as JSON.')
+    parser.add_argument('--output', '-o', default=None, help='File to write results to, stdout if not given.')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS, help='Benchmarks to run.')
+    parser.add_argument('--quick', action='store_true', help='Use smaller inputs for a fast run.')
+    args = parser.parse_args(argv)
+
+    report = {
+        'timestamp' : datetime.now(timezone.utc).isoformat(),
+        'platform' : platform.platform(),
+        'versions' : versions(),
+        'quick' : args.quick,
+        'results' : {},
+    }
+    for name in args.only:
+        print('running %s' % name, file=sys.stderr)
+        start = perf_counter()
+        result = import_module('benchmarks.%s' % name).run(**(QUICK[name] if args.quick else {}))
+        report['results'][name] = {**result, 'seconds' : perf_counter() - start}
+
+    text = json.dumps(report, indent=2)
+    if args.output is None: print(text)
+    else:
+        with open(args.output, 'w') as f: f.write(text)
+    if report['results'].get('import_time', {}).get('within_budget') is False: sys.exit('Import time budget exceeded, see import_time in the results.')
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-call dispatch overhead of chains against their depth and width, nested SequentialChains against their compiled
+execution plans and ForkChains run in turn against their compiled plans and a thread pool.
+
+Usage:
+    python -m benchmarks.chain_overhead
+"""
+from timeit import Timer
+from lightchain.link import Link
+from lightchain.link.ops import ForkChain
+
+class Increment(Link):
+    def logic(self, x : int) -> int:
+        return x + 1
+
+def build_chain(depth : int) -> Link:
+    chain = Increment(name='0')
+    for i in range(1, depth): chain = chain >> Increment(name=str(i))
+    return chain
+
+def build_fork(width : int) -> ForkChain:
+    return ForkChain(*[Increment(name=str(i)) for i in range(width)])
+
+def per_call(func, number : int = 1000, repeat : int = 5) -> float:
+    return min(Timer(lambda: func(0)).repeat(repeat=repeat, number=number)) / number
+
+def run(depths=(2, 10, 100), widths=(2, 8, 32), number : int = 1000) -> dict:
+    depth_results, width_results = [], []
+    for depth in depths:
+        chain = build_chain(depth)
+        compiled = chain.compile()
+        assert chain(0) == compiled(0) == depth
+        nested, flat = per_call(chain, number), per_call(compiled, number)
+        depth_results.append({'links' : depth, 'nested_us' : nested * 1e6, 'compiled_us' : flat * 1e6, 'speedup' : nested / flat})
+    for width in widths:
+        fork = build_fork(width)
+        compiled = fork.compile()
+        assert fork(0) == compiled(0)
+        sequential, flat = per_call(fork, number), per_call(compiled, number)
+        parallel = build_fork(width).parallel('thread')
+        threaded = per_call(parallel, max(number // 10, 1))
+        parallel.shutdown()
+        width_results.append({'branches' : width, 'fork_us' : sequential * 1e6, 'compiled_us' : flat * 1e6, 'thread_us' : threaded * 1e6})
+    return {'depth' : depth_results, 'width' : width_results}
+
+def main() -> None:
+    results = run()
+    print('%6s %14s %14s %8s' % ('links', 'nested (us)', 'compiled (us)', 'speedup'))
+    for row in results['depth']: print('%6d %14.2f %14.2f %7.1fx' % (row['links'], row['nested_us'], row['compiled_us'], row['speedup']))
+    print('%8s %14s %14s %14s' % ('branches', 'fork (us)', 'compiled (us)', 'threads (us)'))
+    for row in results['width']: print('%8d %14.2f %14.2f %14.2f' % (row['branches'], row['fork_us'], row['compiled_us'], row['thread_us']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Per-turn cost of building conversation context against history length, against re-tokenizing the buffered history
+on every turn as StringLengthBuffer.get_maximum_context previously did. Averages are reported at several points of the session.
+
+Usage:
+    python -m benchmarks.conversation_context
+"""
+from random import Random
+from time import perf_counter
+from lightchain.retrieve.memory import ConversationMemory
+from lightchain.retrieve.tokenizer import TokenizerCounter, WhitespaceCounter
+from benchmarks.stubs import StubTokenizer
+
+def legacy_context(memory : ConversationMemory, history : list, new_string : str) -> str:
+    # the get_maximum_context loop prior to incremental accounting, every buffered item is encoded on each call
+    current_len = memory._default_length + memory.count(new_string)
+    start = len(history)
+    for item in reversed(history):
+        item_len = memory.count(item)
+        if current_len + item_len + 1 > memory._max_length: break
+        current_len += item_len + 1
+        start -= 1
+    return memory.JOIN.join([memory.BUFFER['essential'], *history[start:], new_string])
+
+def run(turns : int = 10000, context_length : int = 4096, seed : int = 42, tokenizer : bool = False, checkpoints=(100, 1000, 10000)) -> dict:
+    rng = Random(seed)
+    words = ['token%d' % i for i in range(1000)]
+    messages = [(' '.join(rng.choices(words, k=rng.randint(5, 40))), ' '.join(rng.choices(words, k=rng.randint(20, 120)))) for _ in range(turns)]
+    counter = TokenizerCounter(StubTokenizer()) if tokenizer else WhitespaceCounter()
+    memory = ConversationMemory('stub', context_length=context_length, essential='You are a helpful assistant.', counter=counter)
+    history, legacy, incremental, results, since = [], 0., 0., [], 0
+    for turn, (user, ai) in enumerate(messages, 1):
+        history += [memory.input_prefix + user, memory.output_prefix + ai]
+        start = perf_counter()
+        memory.insert((user, ai))
+        out = memory.get_maximum_context(user)
+        incremental += perf_counter() - start
+        start = perf_counter()
+        expected = legacy_context(memory, history, user)
+        legacy += perf_counter() - start
+        assert out == expected
+        if turn in checkpoints or turn == turns:
+            # per-turn averages since the previous checkpoint, so each row reflects the cost at that history length
+            window = turn - since
+            results.append({'turns' : turn, 'buffered' : len(memory.BUFFER['main']), 'legacy_us' : legacy / window * 1e6, 'incremental_us' : incremental / window * 1e6, 'speedup' : legacy / incremental})
+            legacy, incremental, since = 0., 0., turn
+    return {'context_length' : context_length, 'counter' : type(counter).__name__, 'history' : results}
+
+def main() -> None:
+    results = run()
+    print('context of %d tokens' % results['context_length'])
+    print('%8s %10s %14s %16s %8s' % ('turns', 'buffered', 'legacy (us)', 'incremental (us)', 'speedup'))
+    for row in results['history']: print('%8d %10d %14.1f %16.1f %7.1fx' % (row['turns'], row['buffered'], row['legacy_us'], row['incremental_us'], row['speedup']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+FaissEmbeddingMemory insert, search and document mapping at several corpus sizes, with a stub encoder over a flat index.
+Encoding is done up front so the timings cover the memory rather than the encoder.
+
+Usage:
+    python -m benchmarks.faiss_memory
+"""
+from time import perf_counter
+from typing import List
+import numpy as np
+from benchmarks.stubs import HashEncoder, corpus
+
+class TableEncoder(object):
+    """
+    Looks up vectors encoded ahead of time.
+    """
+    def __init__(self, texts : List[str], encoder : HashEncoder) -> None:
+        self.rows = {text : i for i, text in enumerate(texts)}
+        self.vectors = encoder(texts)
+
+    def __call__(self, texts : List[str]) -> np.ndarray:
+        return self.vectors[[self.rows[text] for text in texts]]
+
+def timed(func, repeat : int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+def run(sizes=(1000, 10000, 100000), dim : int = 64, queries : int = 256, k : int = 10) -> dict:
+    try:
+        import faiss
+        from lightchain.retrieve.faiss import FaissEmbeddingMemory
+    except ImportError as e: return {'skipped' : str(e)}
+    results = []
+    for size in sizes:
+        docs = corpus(size)
+        questions = corpus(queries, seed=7)
+        encoder = TableEncoder(docs + questions, HashEncoder(dim))
+        memory = FaissEmbeddingMemory(faiss.IndexIDMap(faiss.IndexFlatIP(dim)), encoder, query_cache=None)
+        start = perf_counter()
+        memory.insert(docs)
+        insert = perf_counter() - start
+
+        vectors = encoder(questions)
+        search = timed(lambda: memory.search(vectors, {'k' : k}))
+        single = timed(lambda: [memory.search(vector, {'k' : k}) for vector in vectors[:32]]) / 32
+        _, ids = memory.search(vectors, {'k' : k})
+        gather = timed(lambda: memory.docs.gather(ids))
+        table = dict(enumerate(docs))
+        lookup = timed(lambda: [[table[i] for i in row] for row in ids.tolist()])
+        end_to_end = timed(lambda: memory(questions, {'k' : k}))
+        assert memory.docs.gather(ids) == [[table[i] for i in row] for row in ids.tolist()]
+        results.append({
+            'documents' : size,
+            'insert_docs_per_s' : size / insert,
+            'search_batch_us_per_query' : search / queries * 1e6,
+            'search_single_us' : single * 1e6,
+            'gather_ns_per_doc' : gather / ids.size * 1e9,
+            'dict_lookup_ns_per_doc' : lookup / ids.size * 1e9,
+            'end_to_end_us_per_query' : end_to_end / queries * 1e6,
+            'docstore_bytes' : memory.docs.nbytes,
+        })
+    return {'dimension' : dim, 'queries' : queries, 'k' : k, 'index' : 'IndexIDMap(IndexFlatIP)', 'sizes' : results}
+
+def main() -> None:
+    results = run()
+    if 'skipped' in results: return print('skipped: %s' % results['skipped'])
+    print('%10s %14s %16s %14s %16s %16s' % ('documents', 'insert (/s)', 'batch (us/q)', 'single (us)', 'gather (ns/doc)', 'end to end (us/q)'))
+    for row in results['sizes']:
+        print('%10d %14.0f %16.2f %14.2f %16.1f %16.2f' % (row['documents'], row['insert_docs_per_s'], row['search_batch_us_per_query'], row['search_single_us'], row['gather_ns_per_doc'], row['end_to_end_us_per_query']))
+
+if __name__ == '__main__':
+    main()
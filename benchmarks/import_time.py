@@ -0,0 +1,61 @@
+"""
+Time to import lightchain and reach first use in a fresh interpreter, checked against a budget. Heavy dependencies
+(asyncio, matchpy, NumPy, FAISS, transformers) must not be loaded by scenarios which do not use them.
+
+Usage:
+    python -m benchmarks.import_time
+"""
+from subprocess import run as run_process
+import json
+import sys
+
+HEAVY = ('asyncio', 'concurrent.futures', 'matchpy', 'numpy', 'faiss', 'transformers', 'torch', 'sqlite3')
+
+# scenario : (code, budget in milliseconds, modules which must not be loaded)
+SCENARIOS = {
+    'import lightchain' : ('import lightchain', 10, HEAVY),
+    'render AutoPrompt' : ("from lightchain import AutoPrompt\nAutoPrompt('Question: {question}')(question='?')", 50, HEAVY),
+    'import lightchain.retrieve' : ('import lightchain.retrieve', 10, HEAVY),
+    'run SequentialChain' : ("from lightchain import AutoPrompt, chainable\n(AutoPrompt('{x}') >> chainable(lambda s: s.upper()))(x='a')", 150, ('asyncio', 'concurrent.futures', 'numpy', 'faiss', 'transformers', 'torch')),
+}
+
+PROBE = '''
+import sys, json
+from time import perf_counter
+start = perf_counter()
+exec(compile(%r, '<scenario>', 'exec'))
+elapsed = perf_counter() - start
+print(json.dumps({'ms' : elapsed * 1e3, 'loaded' : [m for m in %r if m in sys.modules]}))
+'''
+
+def measure(code : str, heavy, repeat : int) -> dict:
+    samples, loaded = [], []
+    for _ in range(repeat):
+        out = run_process([sys.executable, '-c', PROBE % (code, tuple(heavy))], capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result['ms'])
+        loaded = result['loaded']
+    return {'ms' : min(samples), 'median_ms' : sorted(samples)[len(samples) // 2], 'loaded' : loaded}
+
+def run(repeat : int = 5, scale : float = 1.0) -> dict:
+    """
+    Args:
+        repeat (int, optional): The number of fresh interpreters per scenario, the fastest is compared to the budget. Defaults to 5.
+        scale (float, optional): Multiplies every budget, for slow machines. Defaults to 1.0.
+    """
+    results = []
+    for name, (code, budget, heavy) in SCENARIOS.items():
+        result = measure(code, heavy, repeat)
+        result.update({'scenario' : name, 'budget_ms' : budget * scale})
+        result['within_budget'] = result['ms'] <= result['budget_ms'] and not result['loaded']
+        results.append(result)
+    return {'scenarios' : results, 'within_budget' : all(result['within_budget'] for result in results)}
+
+def main() -> None:
+    results = run()
+    print('%28s %10s %10s  %s' % ('scenario', 'ms', 'budget', 'heavy modules loaded'))
+    for row in results['scenarios']: print('%28s %10.2f %10.0f  %s' % (row['scenario'], row['ms'], row['budget_ms'], ', '.join(row['loaded']) or '-'))
+    assert results['within_budget'], 'Import time budget exceeded'
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Memory retained by each constructed Link and the time to construct it, then per-call time and bytes allocated per
+call of a chain passing dict outputs between stages in 'stage' and 'item' routing.
+
+Usage:
+    python -m benchmarks.link_allocations
+"""
+from timeit import Timer
+import sys
+import tracemalloc
+from lightchain import AutoPrompt, CAT, ForkChain, SequentialChain, chainable
+
+def upper(text : str) -> str:
+    return text.upper()
+
+def strip(text : str) -> str:
+    return text.strip()
+
+LINKS = {
+    'chainable' : lambda: chainable(upper),
+    'AutoPrompt' : lambda: AutoPrompt('Question: {question}\nContext: {context}'),
+    'CAT' : lambda: CAT(' '),
+}
+
+def retained(build, count : int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+def allocated(func) -> int:
+    # the peak only sees the largest live set, so sum every increase in traced memory between function calls and
+    # returns instead, counting each dict a stage builds and discards; includes a few bytes per call of measurement
+    func()
+    total = last = 0
+    def profile(frame, event, arg):
+        nonlocal total, last
+        current = tracemalloc.get_traced_memory()[0]
+        if current > last: total += current - last
+        last = tracemalloc.get_traced_memory()[0]
+    tracemalloc.start()
+    last = tracemalloc.get_traced_memory()[0]
+    sys.setprofile(profile)
+    func()
+    sys.setprofile(None)
+    tracemalloc.stop()
+    return total
+
+def per_call(func, number : int, repeat : int = 5) -> float:
+    return min(Timer(func).repeat(repeat=repeat, number=number)) / number
+
+def build_chain(width : int, depth : int, routing : str) -> SequentialChain:
+    fork = ForkChain(*[chainable(strip, name=str(i)) for i in range(width)])
+    stages = [chainable(upper, name='stage %d' % i) for i in range(depth)]
+    return SequentialChain(fork, *stages).route(routing)
+
+def run(count : int = 10000, widths=(4, 64), depth : int = 8, number : int = 2000) -> dict:
+    links = []
+    for name, build in LINKS.items():
+        link = build()
+        links.append({
+            'link' : name,
+            'bytes_per_link' : retained(build, count),
+            'construct_us' : per_call(build, count, repeat=3) * 1e6,
+            'slotted' : type(link).__dictoffset__ == 0,
+        })
+    routing = []
+    for width in widths:
+        row = {'branches' : width, 'stages' : depth}
+        outputs = {}
+        for mode in ('stage', 'item'):
+            chain = build_chain(width, depth, mode)
+            compiled = chain.compile()
+            outputs[mode] = chain(' text ')
+            assert compiled(' text ') == outputs[mode]
+            row['%s_us' % mode] = per_call(lambda: chain(' text '), max(number // width, 1)) * 1e6
+            row['%s_compiled_us' % mode] = per_call(lambda: compiled(' text '), max(number // width, 1)) * 1e6
+            row['%s_alloc_bytes' % mode] = allocated(lambda: chain(' text '))
+            row['%s_compiled_alloc_bytes' % mode] = allocated(lambda: compiled(' text '))
+        assert outputs['stage'] == outputs['item']
+        routing.append(row)
+    return {'links' : links, 'routing' : routing}
+
+def main() -> None:
+    results = run()
+    print('%12s %16s %16s %10s' % ('link', 'bytes per link', 'construct (us)', 'slotted'))
+    for row in results['links']: print('%12s %16.0f %16.2f %10s' % (row['link'], row['bytes_per_link'], row['construct_us'], row['slotted']))
+    print('%8s %12s %12s %16s %16s %14s %14s %16s %16s' % ('branches', 'stage (us)', 'item (us)', 'compiled stage', 'compiled item', 'stage bytes', 'item bytes', 'compiled stage', 'compiled item'))
+    for row in results['routing']:
+        print('%8d %12.2f %12.2f %16.2f %16.2f %14d %14d %16d %16d' % (row['branches'], row['stage_us'], row['item_us'], row['stage_compiled_us'], row['item_compiled_us'],
+                                                                 row['stage_alloc_bytes'], row['item_alloc_bytes'], row['stage_compiled_alloc_bytes'], row['item_compiled_alloc_bytes']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+AutoPrompt rendering throughput against the previous str.format implementation, in single, list of dicts and columnar mode.
+
+Usage:
+    python -m benchmarks.prompt_render
+"""
+from timeit import Timer
+from lightchain import AutoPrompt
+
+TEMPLATE = 'You are a helpful assistant \n Write a response which answers the question given the context \n Question: {question} \n Context: {context} \n Response:'
+
+def legacy(prompt : str, *args, **kwargs):
+    # the AutoPrompt.__call__ implementation prior to template compilation
+    if args: return [legacy(prompt, **inp) for inp in args[0]]
+    if all(isinstance(item, list) for item in kwargs.values()):
+        kwarg_combinations = [{k: v[i] for k, v in kwargs.items()} for i in range(len(kwargs[list(kwargs.keys())[0]]))]
+        return [prompt.format(**item) for item in kwarg_combinations]
+    return prompt.format(**kwargs)
+
+def per_item(func, items : int, number : int, repeat : int = 5) -> float:
+    return min(Timer(func).repeat(repeat=repeat, number=number)) / (number * items)
+
+def run(batch_size : int = 1000, number : int = 20) -> dict:
+    prompt = AutoPrompt(TEMPLATE)
+    single = {'question' : 'What is a chain?', 'context' : 'A chain is many connected links. ' * 8}
+    rows = [{'question' : 'Question %d' % i, 'context' : 'Context %d ' % i * 8} for i in range(batch_size)]
+    columns = {k : [row[k] for row in rows] for k in single}
+    assert prompt(**single) == legacy(TEMPLATE, **single)
+    assert prompt(rows) == legacy(TEMPLATE, rows) and prompt(**columns) == legacy(TEMPLATE, **columns)
+
+    cases = [
+        ('single', 1, 500 * number, lambda: legacy(TEMPLATE, **single), lambda: prompt(**single)),
+        ('list of dicts', batch_size, number, lambda: legacy(TEMPLATE, rows), lambda: prompt(rows)),
+        ('columnar', batch_size, number, lambda: legacy(TEMPLATE, **columns), lambda: prompt(**columns)),
+    ]
+    results = []
+    for mode, items, n, before, after in cases:
+        old, new = per_item(before, items, n), per_item(after, items, n)
+        results.append({'mode' : mode, 'legacy_ns' : old * 1e9, 'compiled_ns' : new * 1e9, 'prompts_per_s' : 1 / new, 'speedup' : old / new})
+    return {'batch_size' : batch_size, 'modes' : results}
+
+def main() -> None:
+    results = run()
+    print('%14s %14s %14s %8s' % ('mode', 'legacy (ns)', 'compiled (ns)', 'speedup'))
+    for row in results['modes']: print('%14s %14.0f %14.0f %7.1fx' % (row['mode'], row['legacy_ns'], row['compiled_ns'], row['speedup']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Deterministic stand-ins for models, so benchmarks run offline on CPU without downloading weights.
+"""
+from typing import List
+from zlib import crc32
+import numpy as np
+
+class HashEncoder(object):
+    """
+    Encodes each string as a unit vector seeded by its CRC32, the same string always maps to the same vector.
+
+    Args:
+        dim (int, optional): The dimension of the vectors. Defaults to 64.
+    """
+    model_id = 'stub/hash-encoder'
+
+    def __init__(self, dim : int = 64) -> None:
+        self.dim = dim
+
+    def __call__(self, texts : List[str]) -> np.ndarray:
+        vectors = np.stack([np.random.default_rng(crc32(text.encode('utf-8'))).standard_normal(self.dim, dtype=np.float32) for text in texts])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+class StubTokenizer(object):
+    """
+    Splits on whitespace and maps each word to an id, exposing the encode method used by TokenizerCounter.
+    """
+    def __init__(self) -> None:
+        self.vocab = {}
+
+    def encode(self, text : str) -> List[int]:
+        return [self.vocab.setdefault(word, len(self.vocab)) for word in text.split()]
+
+def corpus(size : int, seed : int = 42, vocab : int = 5000, length : int = 32) -> List[str]:
+    """
+    Generates a corpus of documents of random words.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(['word%d' % i for i in range(vocab)])
+    return [' '.join(doc) for doc in words[rng.integers(0, vocab, (size, length))].tolist()]
@@ -1,4 +1,24 @@
-from .prompt import AutoPrompt
-from .link import Link, chainable
+from lightchain._lazy import lazy_exports
 
-__version__ = "0.0.6"
\ No newline at end of file
+__version__ = "0.0.6"
+
+# public names are imported from their modules on first access, so `import lightchain` stays cheap
+_EXPORTS = {
+    'AutoPrompt' : 'lightchain.prompt',
+    'Link' : 'lightchain.link',
+    'chainable' : 'lightchain.link',
+    'SequentialChain' : 'lightchain.link.ops',
+    'ForkChain' : 'lightchain.link.ops',
+    'CAT' : 'lightchain.link.ops',
+}
+
+__all__ = [*_EXPORTS]
+
+# typing is not imported here to keep `import lightchain` cheap, type checkers treat this name as typing.TYPE_CHECKING
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .prompt import AutoPrompt
+    from .link import Link, chainable
+    from .link.ops import SequentialChain, ForkChain, CAT
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
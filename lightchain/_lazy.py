@@ -0,0 +1,25 @@
+from importlib import import_module
+
+def lazy_exports(name : str, exports : dict, namespace : dict) -> tuple:
+    """
+    Builds the module level __getattr__ and __dir__ of a package whose public names are imported from their modules
+    on first access. Each name is stored in the package once imported, so later lookups do not call __getattr__.
+
+    Args:
+        name (str): The name of the package.
+        exports (dict): A mapping of public names to the modules defining them.
+        namespace (dict): The globals of the package.
+
+    Returns:
+        tuple: The __getattr__ and __dir__ functions of the package.
+    """
+    def __getattr__(attr : str):
+        if attr not in exports: raise AttributeError('module %r has no attribute %r' % (name, attr))
+        value = getattr(import_module(exports[attr]), attr)
+        namespace[attr] = value
+        return value
+
+    def __dir__():
+        return sorted({*namespace, *exports})
+
+    return __getattr__, __dir__
@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional, Sequence
+
+def is_column(obj : Any) -> bool:
+    """
+    Checks whether an object is a column of values: a list, tuple, one dimensional array (NumPy, pandas) or Arrow-like array.
+    Strings and bytes are values, not columns.
+
+    Args:
+        obj (Any): The object to check.
+
+    Returns:
+        bool: Whether the object is a column.
+    """
+    if isinstance(obj, (list, tuple)): return True
+    if isinstance(obj, (str, bytes, dict)): return False
+    if hasattr(obj, 'to_pylist'): return True
+    return hasattr(obj, 'tolist') and getattr(obj, 'ndim', 0) == 1
+
+def as_column(obj : Any) -> Sequence:
+    """
+    Converts a column into a sequence of Python values in one step, without going through per-row objects.
+
+    Args:
+        obj (Any): A column as accepted by `is_column`.
+
+    Returns:
+        Sequence: The values of the column.
+    """
+    if isinstance(obj, (list, tuple)): return obj
+    if hasattr(obj, 'to_pylist'): return obj.to_pylist()
+    return obj.tolist()
+
+def as_columns(obj : Any) -> Optional[Dict[str, Sequence]]:
+    """
+    Converts a columnar batch into a dict of columns, returns None if the object is not a columnar batch.
+    Accepts a dict of columns, an Arrow-like table (column_names and column) or a DataFrame-like object (items of columns).
+
+    Args:
+        obj (Any): The batch to convert.
+
+    Returns:
+        dict: A mapping of column names to sequences of values, or None.
+    """
+    if isinstance(obj, dict): items = obj.items()
+    elif hasattr(obj, 'column_names') and hasattr(obj, 'column'): items = ((name, obj.column(name)) for name in obj.column_names)
+    elif hasattr(obj, 'items') and hasattr(obj, 'columns'): items = obj.items()
+    else: return None
+    columns = {}
+    for name, column in items:
+        if not is_column(column): return None
+        columns[name] = as_column(column)
+    return columns
+
+def check_lengths(columns : Dict[str, Sequence]) -> int:
+    """
+    Checks that all columns have the same length.
+
+    Args:
+        columns (dict): A mapping of column names to sequences of values.
+
+    Returns:
+        int: The shared length of the columns, 0 if there are no columns.
+
+    Raises:
+        ValueError: If the columns have different lengths.
+    """
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1: raise ValueError('All columns must have the same length, got lengths %s' % {k : len(v) for k, v in columns.items()})
+    return lengths.pop() if lengths else 0
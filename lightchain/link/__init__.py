@@ -1,78 +1,338 @@
 from abc import abstractmethod
-from typing import Any, Union
-from functools import wraps, partial
-from inspect import signature
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+from functools import update_wrapper, partial
+
+async def to_thread(func : Callable, *args : Any, **kwargs : Any) -> Any:
+    """
+    Runs a synchronous callable in the default executor of the running event loop so it does not block the loop.
+
+    Args:
+        func (callable): The callable to run.
+        *args: Positional arguments passed to the callable.
+        **kwargs: Keyword arguments passed to the callable.
+
+    Returns:
+        Any: The output of the callable.
+    """
+    from asyncio import get_running_loop
+    return await get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+def run_sync(func : Callable, *args : Any, **kwargs : Any) -> Any:
+    """
+    Runs a coroutine function to completion from synchronous code.
+
+    Args:
+        func (callable): The coroutine function to run.
+        *args: Positional arguments passed to the function.
+        **kwargs: Keyword arguments passed to the function.
+
+    Returns:
+        Any: The output of the coroutine.
+
+    Raises:
+        RuntimeError: If called from within a running event loop, use `acall` instead.
+    """
+    from asyncio import run
+    return run(func(*args, **kwargs))
+
+def route_items(out : Any, calls : Iterable[Callable], kwargs : dict) -> Any:
+    """
+    Applies callables in order as a SequentialChain does, but once an output is a dict each of its values is passed
+    through every remaining callable before the next value is started, so a single output dict is built rather than
+    one per stage and the payload is handed from stage to stage as is.
+
+    Args:
+        out (Any): The input to the first callable.
+        calls (Iterable[callable]): The callables to apply in order.
+        kwargs (dict): Keyword arguments passed to every callable.
+
+    Returns:
+        Any: The output of the last callable, a dict with the same keys if any stage returned a dict.
+    """
+    calls = iter(calls)
+    for call in calls:
+        if isinstance(out, dict):
+            rest = (call, *calls)
+            if kwargs: rest = tuple(partial(call, **kwargs) for call in rest)
+            routed = {}
+            for key, value in out.items():
+                for call in rest: value = call(value)
+                routed[key] = value
+            return routed
+        out = call(out, **kwargs)
+    return out
 
 class Link(object):
     """
     A base class for creating Chain operations.
     It provides methods for chaining operations in a sequential or forked manner.
-    
+
+    Built-in links declare __slots__ so their instances carry no per-instance __dict__,
+    subclasses which do not declare __slots__ store attributes in a __dict__ as usual.
+
     Attributes:
         name (str): The name of the Link object. Default is 'Link'.
         description (str): The description of the Link object. Default is 'A Link'.
-        signature (str): The signature of the logic method. It is set in the initializer.
+        signature (Signature): The signature of the logic method, computed on first access.
     """
-
+    __slots__ = ('_signature', '__weakref__')
     __name__ = 'Link'
     __doc__ = 'A Link'
+    name = 'Link'
+    description = 'A Link'
     def __init__(self, **kwargs) -> None:
         """
         Initializes the Link object. Any keyword arguments passed are set as attributes of the object.
         """
-        self._signature = signature(self.logic)
         for key, value in kwargs.items():
             setattr(self, key, value)
-    
+
     def __rshift__(self, right):
         from lightchain.link.ops import SequentialChain
         return SequentialChain(self, right)
-    
+
     def __lshift__(self, left):
         from lightchain.link.ops import SequentialChain
         return SequentialChain(left, self)
-    
+
     def __or__(self, right):
         from lightchain.link.ops import ForkChain
         return ForkChain(self, right)
-    
+
     @property
     def signature(self):
-        return self._signature
-    
+        try: return self._signature
+        except AttributeError:
+            from inspect import signature
+            self._signature = signature(self.logic)
+            return self._signature
+
+    @property
+    def is_async(self) -> bool:
+        """
+        Whether the Link implements native asynchronous logic rather than relying on a thread.
+        """
+        return type(self).alogic is not Link.alogic
+
     @abstractmethod
     def logic(self, *args : Any, **kwargs : Any) -> Any:
         """
         The logic of the Link object. It is implemented in a subclass.
         """
         raise NotImplementedError
-    
+
+    async def alogic(self, *args : Any, **kwargs : Any) -> Any:
+        """
+        The asynchronous logic of the Link object. Override in a subclass for native async support,
+        by default the synchronous logic is run in a thread.
+        """
+        return await to_thread(self.logic, *args, **kwargs)
+
     def __call__(self, *args, **kwargs) -> Any:
-        self.logic(*args, **kwargs)
+        return self.logic(*args, **kwargs)
 
-def chainable(cls : Union[callable, Any], call='__call__', **func_kwargs):
+    async def acall(self, *args, **kwargs) -> Any:
+        """
+        The asynchronous counterpart of __call__. Links without native async logic are run in a thread.
+        """
+        if self.is_async or type(self).__call__ is Link.__call__: return await self.alogic(*args, **kwargs)
+        return await to_thread(self, *args, **kwargs)
+
+    def stream(self, 
+               inputs : Iterable, 
+               chunk_size : int = 64, 
+               ordered : bool = True, 
+               max_workers : Optional[int] = None) -> Iterator:
+        """
+        Lazily applies the Link to each item of an iterable, yielding each output as soon as it is ready.
+        Dict items are passed as keyword arguments, any other item as a single positional argument.
+
+        Args:
+            inputs (Iterable): The inputs, only consumed as outputs are yielded.
+            chunk_size (int, optional): The maximum number of items in flight when using workers. Defaults to 64.
+            ordered (bool, optional): Whether outputs are yielded in input order, otherwise in order of completion. Defaults to True.
+            max_workers (int, optional): The number of threads used to process items, if None items are processed one at a time. Defaults to None.
+
+        Yields:
+            Any: The output for each input.
+        """
+        def call(item):
+            return self(**item) if isinstance(item, dict) else self(item)
+        if not max_workers:
+            for item in inputs: yield call(item)
+            return
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = deque() if ordered else set()
+            for item in inputs:
+                if ordered: pending.append(pool.submit(call, item))
+                else: pending.add(pool.submit(call, item))
+                if len(pending) < chunk_size: continue
+                if ordered: yield pending.popleft().result()
+                else:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done: yield future.result()
+            if ordered:
+                while pending: yield pending.popleft().result()
+            else:
+                for future in pending: yield future.result()
+
+class ChainableLink(Link):
+    """
+    A Link calling a function or a method of a wrapped object, see `chainable`. Functions are wrapped by this class
+    directly so wrapping a function does not create a class. Links are pickled with the function or the instance of
+    the class they wrap, so an unpickled Link keeps any state set after construction and the class is not constructed
+    again; they can be sent to a process pool whenever the wrapped object can be pickled.
+
+    Attributes:
+        obj (Any): The wrapped function, or the instance of the wrapped class.
+        logic (callable): The callable invoked when the Link is called.
+
+    Args:
+        target (callable or type): The function or class to wrap, classes are instantiated with args and kwargs.
+        args (tuple): Positional arguments passed to the class.
+        kwargs (dict): Keyword arguments passed to the class.
+        config (dict): The keyword arguments `chainable` was called with.
+    """
+    __slots__ = ('name', 'description', 'obj', 'logic', '_alogic', '_async', '_target', '_args', '_config')
+    def __init__(self, target : Any, args : tuple, kwargs : dict, config : dict) -> None:
+        self._wrap(target, target(*args, **kwargs) if isinstance(target, type) else target, args, kwargs, config)
+
+    def _wrap(self, target : Any, obj : Any, args : tuple, kwargs : dict, config : dict) -> None:
+        from inspect import iscoroutinefunction
+        config = {'call' : '__call__', 'name' : None, 'description' : None, 'cache' : None, **config}
+        call, name, cache = config['call'], config['name'], config['cache']
+        func_kwargs = {k : v for k, v in config.items() if k not in ('call', 'name', 'description', 'cache')}
+        self.obj = obj
+        if isinstance(target, type): logic = getattr(obj, call) if isinstance(call, str) else call
+        else: logic = target
+        if func_kwargs: logic = partial(logic, **func_kwargs)
+        self.name = name or getattr(target, '__name__', Link.name)
+        self.description = config['description'] or Link.description
+        self._target, self._args, self._config = target, (args, kwargs), config
+        if cache is not None:
+            from lightchain.link.cache import LRUCache, cached, link_identity
+            # each instance gets its own cache, a shared cache separates instances by their identity
+            if cache is True: cache = LRUCache()
+            logic = cached(logic, cache, link_identity(self))
+        self._async = iscoroutinefunction(logic)
+        if self._async:
+            self._alogic = logic
+            # the signature of the synchronous entry point is that of the coroutine function
+            self.logic = update_wrapper(partial(run_sync, logic), logic)
+        else: self.logic = logic
+
+    @property
+    def is_async(self) -> bool:
+        return self._async
+
+    @property
+    def identity(self) -> str:
+        """
+        Identifies the Link in cache keys by the callable it wraps, the arguments its class was constructed with
+        and the options it was wrapped with.
+        """
+        from lightchain.link.cache import make_key, target_identity
+        (args, kwargs), call = self._args, self._config['call']
+        options = {k : v for k, v in self._config.items() if k not in ('call', 'name', 'description', 'cache')}
+        if call != '__call__': options['call'] = call if isinstance(call, str) else target_identity(call)
+        if not (args or kwargs or options): return target_identity(self._target)
+        return make_key(target_identity(self._target), (args, kwargs), options)
+
+    async def alogic(self, *args : Any, **kwargs : Any) -> Any:
+        if self._async: return await self._alogic(*args, **kwargs)
+        return await to_thread(self.logic, *args, **kwargs)
+
+    def __reduce__(self) -> tuple:
+        target = self._target
+        # an instance is pickled as its state, its class may be replaced in its module by the Link class
+        obj = instance_state(self.obj) if isinstance(target, type) else self.obj
+        module, qualname = getattr(target, '__module__', None), getattr(target, '__qualname__', None)
+        if module is not None and qualname is not None:
+            # a decorated function or class is replaced in its module by the Link or its class, which are pickled by name
+            found = locate(module, qualname)
+            if found is self: return locate, (module, qualname)
+            if found is type(self): return restore, (None, obj, *self._args, None, found)
+        return restore, (target, obj, *self._args, self._config)
+
+def locate(module : str, qualname : str) -> Any:
+    """
+    Finds an object by the name of its module and its qualified name, as pickle does.
+
+    Returns:
+        Any: The object, or None if it does not exist.
+    """
+    from importlib import import_module
+    try:
+        obj = import_module(module)
+        for part in qualname.split('.'): obj = getattr(obj, part)
+        return obj
+    except (ImportError, AttributeError): return None
+
+def instance_state(obj : Any) -> Any:
+    """
+    The state of an instance as pickle records it, restored by `from_state`.
+    """
+    getstate = getattr(obj, '__getstate__', None)
+    # object.__getstate__ only exists from Python 3.11
+    return getstate() if getstate is not None else obj.__dict__
+
+def from_state(cls : type, state : Any) -> Any:
+    """
+    Creates an instance of a class from its state without calling __init__, as pickle does.
+    """
+    obj = cls.__new__(cls)
+    if hasattr(obj, '__setstate__'):
+        obj.__setstate__(state)
+        return obj
+    # instances with __slots__ have a state of (__dict__, slots)
+    state, slots = state if isinstance(state, tuple) else (state, None)
+    if state: obj.__dict__.update(state)
+    for key, value in (slots or {}).items(): setattr(obj, key, value)
+    return obj
+
+def restore(target : Any, obj : Any, args : tuple, kwargs : dict, config : Optional[dict], cls : Optional[type] = None) -> ChainableLink:
+    """
+    Rebuilds a Link created by `chainable` when it is unpickled, around its function or the state of its instance,
+    without constructing the wrapped class again. cls is the class of the Link if it was pickled by name, otherwise
+    a class is wrapped again to recreate it.
+    """
+    if cls is not None: target, config = cls.__wrapped__, cls._chainable
+    elif isinstance(target, type): cls = chainable(target, **config)
+    else: cls = ChainableLink
+    if isinstance(target, type): obj = from_state(target, obj)
+    link = cls.__new__(cls)
+    link._wrap(target, obj, args, kwargs, config)
+    return link
+
+def chainable(cls : Union[callable, Any] = None, call='__call__', name : Optional[str] = None, description : Optional[str] = None, cache : Any = None, **func_kwargs):
     """
     Wraps a class to make it chainable in a Chain. The wrapped class inherits from the Link class.
+    Coroutine functions and methods are wrapped as native async links, calling them synchronously runs them in a new event loop.
+    If no class is passed, a decorator is returned.
 
     Args:
         cls (callable or Any): The class or function to be wrapped.
         call (str or callable, optional): The method of the class to be called when the object is called. If a callable is passed, it is used directly. Defaults to '__call__'.
-        name (str, optional): The name of the Link object. 
+        name (str, optional): The name of the Link object.
         description (str, optional): The description of the Link object.
+        cache (Cache or bool, optional): A cache from `lightchain.link.cache` storing outputs of the wrapped callable, True gives each Link its own in-memory LRUCache. Defaults to None.
+        **func_kwargs: Keyword arguments bound to every call of the wrapped callable.
 
     Returns:
-        Wrapper: The wrapped class.
+        ChainableLink: A Link calling the function if a function was passed, otherwise a subclass of ChainableLink whose instances wrap an instance of the class.
     """
+    if cls is None: return partial(chainable, call=call, name=name, description=description, cache=cache, **func_kwargs)
+    if cache is False: cache = None
+    config = {'call' : call, 'name' : name, 'description' : description, 'cache' : cache, **func_kwargs}
+    if not isinstance(cls, type): return ChainableLink(cls, (), {}, config)
 
-    @wraps(cls)
-    class Wrapper(Link):
+    class Wrapper(ChainableLink):
+        __slots__ = ()
+        _chainable = config
         def __init__(self, *args, **kwargs) -> None:
-            super().__init__()
-            if isinstance(cls, callable):
-                self.obj, self.logic = cls, cls
-            else:
-                self.obj = cls(*args, **kwargs)
-                self.logic = getattr(self.obj, call) 
-                self._signature = signature(self.logic)
-            if kwargs: self.logic = partial(self.logic, **func_kwargs)
-    return Wrapper() if isinstance(cls, callable) else Wrapper
+            super().__init__(cls, args, kwargs, config)
+
+    update_wrapper(Wrapper, cls, updated=())
+    return Wrapper
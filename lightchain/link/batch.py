@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import Future
+from queue import Queue, Empty
+from threading import Lock, Thread
+from time import monotonic
+from typing import Any, List, Optional, Tuple
+from lightchain.link import Link
+
+class BatchLink(Link):
+    """
+    Wraps a Link which accepts a list of inputs so that concurrent single calls are coalesced into one batched call.
+    Requests are collected until either max_batch_size requests are waiting or max_wait seconds have passed since the first,
+    the wrapped link is then called once with the list of inputs and each caller receives its own output.
+    Requests with different keyword arguments are never placed in the same call.
+
+    Attributes:
+        link (Link): The wrapped Link, it must return a list with one output per input.
+        max_batch_size (int): The maximum number of inputs passed to the wrapped Link at once.
+        max_wait (float): The maximum number of seconds to wait for a batch to fill.
+        name (str): The name of the BatchLink object. Defaults to the name of the wrapped Link.
+        description (str): The description of the BatchLink object.
+
+    Args:
+        link (Link): The Link to wrap.
+        max_batch_size (int, optional): The maximum number of inputs passed to the wrapped Link at once. Defaults to 32.
+        max_wait (float, optional): The maximum number of seconds to wait for a batch to fill. Defaults to 0.005.
+        name (str, optional): The name of the BatchLink object. Defaults to the name of the wrapped Link.
+        description (str, optional): The description of the BatchLink object. Defaults to 'Micro-batches concurrent calls'.
+    """
+    def __init__(self,
+                 link : Link,
+                 max_batch_size : int = 32,
+                 max_wait : float = 0.005,
+                 name : Optional[str] = None,
+                 description : str = 'Micro-batches concurrent calls') -> None:
+        super().__init__(name=name or link.name, description=description)
+        if max_batch_size < 1: raise ValueError('max_batch_size must be at least 1, got %d' % max_batch_size)
+        self.link = link
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = Queue()
+        self._lock = Lock()
+        self._worker = None
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = Thread(target=self._run, name='BatchLink-%s' % self.name, daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> Tuple[List[Tuple[Any, dict, Future]], bool]:
+        first = self._queue.get()
+        if first is None: return [], True
+        batch = [first]
+        deadline = monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - monotonic()
+            try: request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except Empty: break
+            if request is None: return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _dispatch(self, batch : List[Tuple[Any, dict, Future]]) -> None:
+        # group requests by their keyword arguments, these are usually identical so this is a single pass
+        groups = []
+        for item, kwargs, future in batch:
+            for group_kwargs, requests in groups:
+                if group_kwargs == kwargs:
+                    requests.append((item, future))
+                    break
+            else: groups.append((kwargs, [(item, future)]))
+
+        for kwargs, requests in groups:
+            try:
+                out = self.link([item for item, _ in requests], **kwargs)
+                if len(out) != len(requests):
+                    raise ValueError('Link %s returned %d outputs for a batch of %d inputs' % (self.link.name, len(out), len(requests)))
+            except BaseException as e:
+                for _, future in requests: future.set_exception(e)
+                continue
+            for (_, future), value in zip(requests, out): future.set_result(value)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch: self._dispatch(batch)
+
+    def submit(self, item : Any, **kwargs : Any) -> Future:
+        """
+        Queues a single input to be batched.
+
+        Args:
+            item (Any): A single input to the wrapped Link.
+            **kwargs: Keyword arguments passed to the wrapped Link.
+
+        Returns:
+            Future: A future resolving to the output for this input.
+        """
+        self._start()
+        future = Future()
+        self._queue.put((item, kwargs, future))
+        return future
+
+    def close(self) -> None:
+        """
+        Stops the batching thread once all queued requests have been dispatched.
+        """
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                self._queue.put(None)
+                self._worker.join()
+            self._worker = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        for key in ('_queue', '_lock', '_worker'): state.pop(key)
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        self.__dict__.update(state)
+        self._queue = Queue()
+        self._lock = Lock()
+        self._worker = None
+
+    def logic(self, item : Any, **kwargs : Any) -> Any:
+        """
+        Submits a single input and blocks until its batch has been processed.
+
+        Args:
+            item (Any): A single input to the wrapped Link.
+            **kwargs: Keyword arguments passed to the wrapped Link.
+
+        Returns:
+            Any: The output for this input.
+        """
+        return self.submit(item, **kwargs).result()
+
+    async def alogic(self, item : Any, **kwargs : Any) -> Any:
+        """
+        Submits a single input and awaits its batch without blocking the event loop.
+
+        Args:
+            item (Any): A single input to the wrapped Link.
+            **kwargs: Keyword arguments passed to the wrapped Link.
+
+        Returns:
+            Any: The output for this input.
+        """
+        return await asyncio.wrap_future(self.submit(item, **kwargs))
@@ -0,0 +1,323 @@
+from abc import abstractmethod
+from collections import OrderedDict
+from functools import partial, wraps
+from hashlib import sha256
+from inspect import iscoroutinefunction
+from threading import Lock
+from time import monotonic, time
+from types import MethodType
+from typing import Any, Callable, Optional
+import pickle
+from lightchain.link import ChainableLink, Link
+
+MISS = object()
+
+def canonical(obj : Any) -> Any:
+    """
+    Converts an object into a form whose pickle does not depend on dict or set ordering.
+
+    Args:
+        obj (Any): The object to convert.
+
+    Returns:
+        Any: The converted object.
+    """
+    if isinstance(obj, dict): return ('__dict__', tuple(sorted(((canonical(k), canonical(v)) for k, v in obj.items()), key=repr)))
+    if isinstance(obj, (set, frozenset)): return ('__set__', tuple(sorted((canonical(v) for v in obj), key=repr)))
+    if isinstance(obj, (list, tuple)): return (type(obj).__name__, tuple(canonical(v) for v in obj))
+    return obj
+
+def make_key(identity : str, args : tuple, kwargs : dict) -> str:
+    """
+    Builds a stable content hash for a call.
+
+    Args:
+        identity (str): The identity of the callable, calls with the same arguments to different identities never collide.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+
+    Returns:
+        str: A hex digest identifying the call.
+
+    Raises:
+        ValueError: If the arguments cannot be pickled, their repr may hold memory addresses which are reused within a process and differ between processes.
+    """
+    payload = (identity, canonical(args), canonical(kwargs))
+    try: data = pickle.dumps(payload, protocol=4)
+    except Exception as e: raise ValueError('Cannot build a cache key for %s as its arguments cannot be pickled: %s' % (identity, str(e))) from e
+    return sha256(data).hexdigest()
+
+class Cache(object):
+    """
+    The Cache class is an abstract base class for result caches.
+
+    Attributes:
+        hits (int): The number of lookups which found a value.
+        misses (int): The number of lookups which did not find a value.
+        evictions (int): The number of values removed due to size or age.
+    """
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict:
+        return {'hits' : self.hits, 'misses' : self.misses, 'evictions' : self.evictions}
+
+    @abstractmethod
+    def get(self, key : str) -> Any:
+        """
+        Looks up a key, returning MISS if it is not present or has expired.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key : str, value : Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self) -> None:
+        raise NotImplementedError
+
+class LRUCache(Cache):
+    """
+    An in-memory least recently used cache with an optional time to live.
+
+    Args:
+        max_size (int, optional): The maximum number of entries, if None the cache is unbounded. Defaults to 1024.
+        ttl (float, optional): Seconds after which an entry expires, if None entries never expire. Defaults to None.
+    """
+    def __init__(self, max_size : Optional[int] = 1024, ttl : Optional[float] = None) -> None:
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key : str) -> Any:
+        with self._lock:
+            entry = self._data.get(key, MISS)
+            if entry is not MISS:
+                value, expires = entry
+                if expires is None or expires > monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return MISS
+
+    def set(self, key : str, value : Any) -> None:
+        with self._lock:
+            self._data[key] = (value, None if self.ttl is None else monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while self.max_size is not None and len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock: self._data.clear()
+
+class SQLiteCache(Cache):
+    """
+    A persistent cache stored in a local SQLite database, values are pickled. Entries survive restarts and
+    can be shared by processes on the same machine.
+
+    Args:
+        path (str): The path of the database file.
+        max_size (int, optional): The maximum number of entries, least recently used entries are removed first. The number of entries is tracked as entries are written and recounted every `recount` writes to include writes by other processes. Defaults to None.
+        ttl (float, optional): Seconds after which an entry expires. Defaults to None.
+        recount (int, optional): The number of writes after which entries are counted again. Defaults to 1024.
+    """
+    def __init__(self, path : str, max_size : Optional[int] = None, ttl : Optional[float] = None, recount : int = 1024) -> None:
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.recount = recount
+        self._lock = Lock()
+        import sqlite3
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self._count = self._connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        self._writes = 0
+
+    def __len__(self) -> int:
+        with self._lock: return self._connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def get(self, key : str) -> Any:
+        now = time()
+        with self._lock:
+            row = self._connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                value, expires = row
+                if expires is None or expires > now:
+                    self._connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+                    self.hits += 1
+                    return pickle.loads(value)
+                self._connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self._count -= 1
+                self.evictions += 1
+            self.misses += 1
+            return MISS
+
+    def set(self, key : str, value : Any) -> None:
+        now = time()
+        data = pickle.dumps(value, protocol=4)
+        with self._lock:
+            exists = self._connection.execute('SELECT 1 FROM cache WHERE key = ?', (key,)).fetchone() is not None
+            self._connection.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', (key, data, None if self.ttl is None else now + self.ttl, now))
+            if not exists: self._count += 1
+            self._writes += 1
+            if self.max_size is None: return
+            # counting is a scan of the table, so the count is only refreshed every so often
+            if self._writes % self.recount == 0: self._count = self._connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            excess = self._count - self.max_size
+            if excess > 0:
+                self._connection.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
+                self._count -= excess
+                self.evictions += excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute('DELETE FROM cache')
+            self._count = 0
+
+    def close(self) -> None:
+        self._connection.close()
+
+def cached(func : Callable, cache : Cache, identity : str) -> Callable:
+    """
+    Wraps a function or coroutine function so that its results are stored in a cache.
+
+    Args:
+        func (callable): The function to wrap.
+        cache (Cache): The cache storing results.
+        identity (str): The identity of the function used in cache keys.
+
+    Returns:
+        callable: The wrapped function.
+    """
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def acall(*args, **kwargs):
+            key = make_key(identity, args, kwargs)
+            value = cache.get(key)
+            if value is MISS:
+                value = await func(*args, **kwargs)
+                cache.set(key, value)
+            return value
+        return acall
+
+    @wraps(func)
+    def call(*args, **kwargs):
+        key = make_key(identity, args, kwargs)
+        value = cache.get(key)
+        if value is MISS:
+            value = func(*args, **kwargs)
+            cache.set(key, value)
+        return value
+    return call
+
+def target_identity(target : Any) -> str:
+    """
+    Identifies a function, class or other callable by its module and qualified name. Partials and bound methods include
+    what they are bound to, and lambdas and nested functions, which share qualified names, their line and closure.
+
+    Args:
+        target (Any): The callable to identify.
+
+    Returns:
+        str: The identity of the callable.
+    """
+    if isinstance(target, partial): return make_key(target_identity(target.func), target.args, target.keywords)
+    if isinstance(target, MethodType):
+        return make_key(target_identity(target.__func__), (target.__self__,), {})
+    if not hasattr(target, '__qualname__'): target = type(target)
+    identity = '%s.%s' % (getattr(target, '__module__', None), target.__qualname__)
+    code = getattr(target, '__code__', None)
+    if code is not None and '<' in target.__qualname__:
+        try: cells = tuple(cell.cell_contents for cell in target.__closure__ or ())
+        except ValueError: cells = ()
+        identity = make_key('%s@%d' % (identity, code.co_firstlineno), cells, {})
+    return identity
+
+def state_identity(link : Link) -> str:
+    """
+    Identifies a Link by a hash of its pickled state, excluding its lazily computed signature.
+
+    Raises:
+        ValueError: If the Link cannot be pickled.
+    """
+    signature = getattr(link, '_signature', MISS)
+    if signature is not MISS: del link._signature
+    try: data = pickle.dumps(link, protocol=4)
+    except Exception as e: raise ValueError('Link %s cannot be pickled to identify it in cache keys, pass a namespace: %s' % (link.name, str(e))) from e
+    finally:
+        if signature is not MISS: link._signature = signature
+    return '%s@%s' % (target_identity(link), sha256(data).hexdigest())
+
+def link_identity(link : Any, name : Optional[str] = None) -> str:
+    """
+    Identifies a Link or callable in cache keys. Links made by `chainable` are identified by what they wrap, the
+    arguments their class was constructed with and the options they were wrapped with, chains by the links they
+    contain, other Links by their pickled state unless a name is given and other callables by their qualified name.
+
+    Args:
+        link (Any): The Link or callable to identify.
+        name (str, optional): A name or namespace appended to the identity, identifying a Link in place of its state. Defaults to the name of the Link.
+
+    Returns:
+        str: The identity of the Link.
+
+    Raises:
+        ValueError: If a Link is identified by its state and cannot be pickled.
+    """
+    if isinstance(link, ChainableLink): identity = link.identity
+    elif isinstance(link, Link) and isinstance(getattr(link, 'links', None), dict):
+        identity = make_key(target_identity(link), tuple(link_identity(child) for child in link.links.values()), {})
+    elif isinstance(link, Link) and name is None: identity = state_identity(link)
+    else: identity = target_identity(link)
+    return '%s:%s' % (identity, name or getattr(link, 'name', ''))
+
+class CacheLink(Link):
+    """
+    Wraps a Link so that its outputs are cached, keyed on the identity of the Link and a stable hash of its arguments.
+    The identity is the class of the wrapped Link and a hash of its pickled state taken when the CacheLink is created,
+    see `link_identity`. Pass a namespace to identify the Link by its class and the namespace instead, for links which
+    cannot be pickled (e.g. holding a FAISS index) or are too large to hash, or whose state changes between calls.
+
+    Attributes:
+        link (Link): The wrapped Link.
+        cache (Cache): The cache storing outputs.
+
+    Args:
+        link (Link): The Link to wrap.
+        cache (Cache, optional): The cache storing outputs. Defaults to an LRUCache.
+        namespace (str, optional): Identifies the Link with its class in place of its state. Defaults to None.
+        name (str, optional): The name of the CacheLink object. Defaults to the name of the wrapped Link.
+        description (str, optional): The description of the CacheLink object. Defaults to 'Caches outputs'.
+    """
+    def __init__(self,
+                 link : Link,
+                 cache : Optional[Cache] = None,
+                 namespace : Optional[str] = None,
+                 name : Optional[str] = None,
+                 description : str = 'Caches outputs') -> None:
+        self.link = link
+        self.cache = cache if cache is not None else LRUCache()
+        identity = link_identity(link, namespace)
+        self.logic = cached(link.__call__, self.cache, identity)
+        self._alogic = cached(link.acall, self.cache, identity)
+        super().__init__(name=name or link.name, description=description)
+        self._signature = link.signature
+
+    async def alogic(self, *args, **kwargs) -> Any:
+        return await self._alogic(*args, **kwargs)
@@ -0,0 +1,41 @@
+"""
+The expression classes chains are built on. Chains are matchpy expressions when matchpy is installed,
+otherwise minimal stand-ins are used which support building and running chains but not pattern matching.
+"""
+from abc import ABCMeta
+
+try:
+    from matchpy import Wildcard, Operation, Arity
+except ImportError:
+    class Arity(object):
+        """
+        The number of operands an operation takes, as (minimum count, fixed size).
+        """
+        nullary = (0, True)
+        unary = (1, True)
+        binary = (2, True)
+        ternary = (3, True)
+        polyadic = (2, False)
+        variadic = (1, False)
+
+    class Wildcard(object):
+        """
+        Placeholder for matchpy.Wildcard, no instances exist without matchpy.
+        """
+
+    class _OperationMeta(ABCMeta):
+        def __call__(cls, *operands, variable_name=None):
+            # as matchpy, operands are passed to the initializer as a single list
+            operation = cls.__new__(cls)
+            operation.__init__(list(operands), variable_name=variable_name)
+            return operation
+
+    class Operation(object, metaclass=_OperationMeta):
+        """
+        Stands in for matchpy.Operation when matchpy is not installed.
+        """
+        arity = Arity.variadic
+        associative = False
+        commutative = False
+        one_identity = False
+        infix = False
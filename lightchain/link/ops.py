@@ -1,9 +1,16 @@
 from functools import partial
+from os import cpu_count
+from time import monotonic
 from types import FunctionType
-from matchpy import Wildcard, Operation, Arity
 from abc import abstractmethod
-from typing import Any, Dict, Iterable, List, Union
-from lightchain.link import Link, chainable
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
+from lightchain.link import Link, chainable, route_items, trace
+from lightchain.link.expression import Wildcard, Operation, Arity
+from lightchain.columns import as_column, check_lengths, is_column
+
+# asyncio and concurrent.futures are imported where they are used, plain sequential chains need neither
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
 
 def get_link(link) -> Any:
     """
@@ -46,7 +53,7 @@ class Chain(Link, Operation):
     arity = Arity.polyadic
     def __init__(self, operands : Iterable, **kwargs):
         super().__init__(operands=operands, **kwargs)
-        self.links = {link.name : get_link(link) for link in operands}
+        self.links = {link.name : link for link in map(get_link, operands)}
 
     def __getitem__(self, i) -> Any:
         return self.links[i]
@@ -54,6 +61,16 @@ class Chain(Link, Operation):
     def __len__(self) -> int:
         return len(self.links)
 
+    def compile(self) -> Link:
+        """
+        Compiles the Chain into a flat execution plan, see `lightchain.link.plan.CompiledChain`.
+
+        Returns:
+            CompiledChain: A Link with the same behaviour as the Chain.
+        """
+        from lightchain.link.plan import CompiledChain
+        return CompiledChain(self if isinstance(self, SequentialChain) else SequentialChain(self))
+
     @abstractmethod
     def __call__(self, input) -> Any:
         raise NotImplementedError
@@ -63,23 +80,47 @@ class SequentialChain(Chain):
     The SequentialChain class represents a sequence of operations (Links) to be performed in a specific order.
     It inherits from the Chain class.
 
+    When a link returns a dict, every following link is applied to each of its values. By default each stage is
+    applied to every value before the next stage builds a new dict, call `route` to pass each value through all
+    remaining stages in turn instead.
+
     Attributes:
         name (str): The name of the SequentialChain object. Default is 'Sequential Chain'.
+        routing (str): How dict outputs are passed between stages, 'stage' or 'item'. Default is 'stage'.
 
     Args:
         operands (Iterable): An iterable of objects to be coerced into Link objects and added to the Chain.
         **kwargs: Additional keyword arguments are passed to the super class initializers.
     """
     name = 'Sequential Chain'
+    routing = 'stage'
     def __init__(self, operands : Iterable, **kwargs):
         """
         Initializes the SequentialChain object. It coerces the operands into Link objects and adds them to the Chain.
         """
         super().__init__(operands=operands, **kwargs)
 
+    def route(self, mode : str = 'item') -> 'SequentialChain':
+        """
+        Configures how dict outputs are passed between stages. In 'stage' mode each stage builds a new dict of its
+        outputs. In 'item' mode each value is passed through all remaining stages before the next, so only the final
+        dict is built and values are handed from stage to stage without copying. Outputs are the same in both modes,
+        only the order in which links see values differs.
+
+        Args:
+            mode (str, optional): 'stage' or 'item'. Defaults to 'item'.
+
+        Returns:
+            SequentialChain: The SequentialChain itself, so the call can be used inline when building a chain.
+        """
+        if mode not in ('stage', 'item'): raise ValueError("Routing must be one of 'stage' or 'item', got %s" % str(mode))
+        self.routing = mode
+        return self
+
     def logic(self, *args, **kwargs):
         """
         Implements the logic of the SequentialChain. It applies each link in the Chain to the input in order.
+        If only keyword arguments are passed, they are the input to the first link.
 
         Args:
             args (Any): The input to the Chain.
@@ -88,11 +129,51 @@ class SequentialChain(Chain):
         Returns:
             Any: The output of the Chain.
         """
-        for link in self.links.values():
+        links = self.links.values() if trace.profiler is None else [*map(trace.profiler.wrap, self.links.values())]
+        links = iter(links)
+        if args: out = args[0] if len(args) == 1 else args
+        else: out, kwargs = next(links)(**kwargs), {}
+        if self.routing == 'item': return route_items(out, links, kwargs)
+        for link in links:
             if isinstance(out, dict): out = {k : link(v, **kwargs) for k, v in out.items()}
             else: out = link(out, **kwargs)
         return out
 
+    async def alogic(self, *args, **kwargs):
+        """
+        The asynchronous counterpart of 'logic'. Each link is awaited in order, dict outputs are fanned out concurrently.
+        In 'item' routing each value moves on to the next link as soon as it is ready.
+
+        Args:
+            args (Any): The input to the Chain.
+            **kwargs: Additional keyword arguments are passed to the link.
+
+        Returns:
+            Any: The output of the Chain.
+        """
+        import asyncio
+        calls = [link.acall for link in self.links.values()] if trace.profiler is None else [*map(trace.profiler.awrap, self.links.values())]
+        calls = iter(calls)
+        if args: out = args[0] if len(args) == 1 else args
+        else: out, kwargs = await next(calls)(**kwargs), {}
+        if self.routing == 'item':
+            for call in calls:
+                if isinstance(out, dict):
+                    rest = (call, *calls)
+                    async def item(value):
+                        for call in rest: value = await call(value, **kwargs)
+                        return value
+                    values = await asyncio.gather(*map(item, out.values()))
+                    return dict(zip(out.keys(), values))
+                out = await call(out, **kwargs)
+            return out
+        for call in calls:
+            if isinstance(out, dict): 
+                values = await asyncio.gather(*[call(v, **kwargs) for v in out.values()])
+                out = dict(zip(out.keys(), values))
+            else: out = await call(out, **kwargs)
+        return out
+
     def __call__(self, *args, **kwargs) -> Any:
         """
         Calls the 'logic' method with the given arguments.
@@ -104,24 +185,190 @@ class SequentialChain(Chain):
         Returns:
             Any: The output of the Chain.
         """
+        if not args: return self.logic(**kwargs)
         if len(args) == 1: return self.logic(args[0], **kwargs)
         else: return [*map(partial(self.logic, **kwargs), args)]
 
+    async def acall(self, *args, **kwargs) -> Any:
+        """
+        The asynchronous counterpart of '__call__'. Multiple inputs are run concurrently.
+
+        Args:
+            *args: The input to the Chain.
+            **kwargs: Additional keyword arguments are passed to the link.
+
+        Returns:
+            Any: The output of the Chain.
+        """
+        if not args: return await self.alogic(**kwargs)
+        if len(args) == 1: return await self.alogic(args[0], **kwargs)
+        import asyncio
+        return [*await asyncio.gather(*[self.alogic(arg, **kwargs) for arg in args])]
+
+# the branches of the ForkChain owning a process pool, set once in each of its worker processes
+_branches : Dict[str, Link] = {}
+
+def _set_branches(links : Dict[str, Link]) -> None:
+    global _branches
+    _branches = links
+
+def _run_branch(name : str, args : tuple, kwargs : dict) -> Any:
+    return _branches[name](*args, **kwargs)
+
 class ForkChain(Chain):
     """
     The ForkChain class represents a set of operations (Links) to be performed in parallel.
 
+    By default each branch is run in turn in the calling thread. Call `parallel` to run branches concurrently
+    on a thread pool (I/O bound or GIL releasing links) or a process pool (CPU bound links). A process pool created by
+    the chain receives a copy of every link once per worker when it is started by the first call, later calls only
+    send the inputs, so changes to a link after the first call are not seen by the workers. An Executor passed by the
+    user is shared with other work, so links are pickled with every call instead.
+
     Attributes:
         name (str): The name of the ForkChain object. Default is 'Forked Chain'.
+        executor (str or Executor): The executor used to run branches, one of None, 'thread', 'process' or an Executor instance. Default is None.
+        max_workers (int): The maximum number of workers in a pool created by the chain. Default is None (one per branch, bounded by the CPU count for processes).
+        timeout (float or dict): Seconds to wait for each branch, either for all branches or as a mapping of link names to seconds. Default is None.
 
     Args:
         operands (Iterable): An iterable of objects to be coerced into Link objects and added to the Chain.
         **kwargs: Additional keyword arguments are passed to the super class initializers.
     """
     name = 'Forked Chain'
+    executor = None
+    max_workers = None
+    timeout = None
+    _pool = None
     def __init__(self, operands : Iterable, **kwargs):
         super().__init__(operands=operands, **kwargs)
 
+    def parallel(self, 
+                 executor : Union[str, 'Executor'] = 'thread', 
+                 max_workers : Optional[int] = None, 
+                 timeout : Optional[Union[float, Dict[str, float]]] = None) -> 'ForkChain':
+        """
+        Configures the ForkChain to run its branches concurrently.
+
+        Args:
+            executor (str or Executor, optional): 'thread', 'process', None to run sequentially, or an existing Executor which is used as is. Defaults to 'thread'.
+            max_workers (int, optional): The maximum number of workers in the pool. Defaults to None.
+            timeout (float or dict, optional): Seconds to wait for each branch, either for all branches or per link name. Defaults to None.
+
+        Returns:
+            ForkChain: The ForkChain itself, so the call can be used inline when building a chain.
+
+        Raises:
+            ValueError: If the executor is not recognised, or a process pool is requested and a link cannot be pickled.
+        """
+        from concurrent.futures import Executor, ProcessPoolExecutor
+        if executor not in (None, 'thread', 'process') and not isinstance(executor, Executor):
+            raise ValueError("Executor must be one of None, 'thread', 'process' or an Executor, got %s" % str(executor))
+        if executor == 'process' or isinstance(executor, ProcessPoolExecutor):
+            import pickle
+            # links are sent to worker processes by pickling, fail here rather than on the first call
+            for name, link in self.links.items():
+                try: pickle.dumps(link)
+                except Exception as e: raise ValueError("Link %s cannot be pickled so cannot run in a process pool: %s" % (name, str(e))) from e
+        self.shutdown()
+        self.executor = executor
+        self.max_workers = max_workers
+        self.timeout = timeout
+        return self
+
+    def _get_pool(self) -> 'Executor':
+        from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+        if isinstance(self.executor, Executor): return self.executor
+        if self._pool is None:
+            if self.executor == 'thread': self._pool = ThreadPoolExecutor(max_workers=self.max_workers or len(self.links))
+            else: self._pool = ProcessPoolExecutor(max_workers=self.max_workers or min(len(self.links), cpu_count() or 1), initializer=_set_branches, initargs=(self.links,))
+        return self._pool
+
+    def _get_timeout(self, name : str) -> Optional[float]:
+        if isinstance(self.timeout, dict): return self.timeout.get(name)
+        return self.timeout
+
+    def shutdown(self, wait : bool = True) -> None:
+        """
+        Shuts down any pool created by the ForkChain. Executors passed by the user are left running.
+
+        Args:
+            wait (bool, optional): Whether to wait for running branches to finish. Defaults to True.
+        """
+        if self._pool is not None: self._pool.shutdown(wait=wait)
+        self._pool = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop('_pool', None)
+        # executors passed by the user are not copied, only the strings naming pools the chain creates
+        if state.get('executor') not in (None, 'thread', 'process'): state['executor'] = None
+        return state
+
+    def logic(self, *args, **kwargs) -> Dict[str, Any]:
+        """
+        Applies each link in the Chain to the same input, using the configured executor if any.
+
+        Args:
+            *args: The input to the Chain.
+            **kwargs: Additional keyword arguments are passed to the link.
+
+        Returns:
+            Dict[str, Any]: A mapping of link names to their output.
+
+        Raises:
+            TimeoutError: If a branch does not finish within its timeout.
+        """
+        links = self.links
+        # branches sent to other processes cannot record into this process
+        if trace.profiler is not None:
+            from concurrent.futures import ProcessPoolExecutor
+            if not (self.executor == 'process' or isinstance(self.executor, ProcessPoolExecutor)):
+                links = {name : trace.profiler.wrap(link) for name, link in links.items()}
+        if self.executor is None: return {name : link(*args, **kwargs) for name, link in links.items()}
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        pool = self._get_pool()
+        start = monotonic()
+        # workers of a pool created for processes already hold the links, see the class docstring
+        if self.executor == 'process': futures = {name : pool.submit(_run_branch, name, args, kwargs) for name in links}
+        else: futures = {name : pool.submit(link, *args, **kwargs) for name, link in links.items()}
+        timeouts = {name : self._get_timeout(name) for name in futures}
+        # wait on branches in order of their deadline so each one is checked as soon as its timeout expires
+        order = sorted(futures, key=lambda name : float('inf') if timeouts[name] is None else timeouts[name])
+        out = {}
+        for name in order:
+            timeout = timeouts[name]
+            try:
+                out[name] = futures[name].result(timeout=None if timeout is None else max(0., start + timeout - monotonic()))
+            except FutureTimeoutError:
+                for pending in futures.values(): pending.cancel()
+                raise TimeoutError("Link %s did not finish within %s seconds" % (name, str(timeout)))
+        out = {name : out[name] for name in futures}
+        return out
+
+    async def alogic(self, *args, **kwargs) -> Dict[str, Any]:
+        """
+        The asynchronous counterpart of 'logic'. Branches are run concurrently with asyncio.gather, the executor is not used.
+
+        Args:
+            *args: The input to the Chain.
+            **kwargs: Additional keyword arguments are passed to the link.
+
+        Returns:
+            Dict[str, Any]: A mapping of link names to their output.
+
+        Raises:
+            TimeoutError: If a branch does not finish within its timeout.
+        """
+        import asyncio
+        async def branch(name, link):
+            timeout = self._get_timeout(name)
+            call = link.acall if trace.profiler is None else trace.profiler.awrap(link)
+            try: return await asyncio.wait_for(call(*args, **kwargs), timeout)
+            except asyncio.TimeoutError: raise TimeoutError("Link %s did not finish within %s seconds" % (name, str(timeout)))
+        values = await asyncio.gather(*[branch(name, link) for name, link in self.links.items()])
+        return dict(zip(self.links.keys(), values))
+
     def __call__(self, *args, **kwargs) -> Any:
         """
         Applies each link in the Chain to the input in parallel.
@@ -134,24 +381,54 @@ class ForkChain(Chain):
             Any: The output of the Chain.
         """
         if args:
-            if len(args) == 1: return [self(**inp) for inp in args[0]]
+            if len(args) == 1: 
+                if isinstance(args[0], list): return [self(**inp) for inp in args[0]]
+                return self.logic(args[0], **kwargs)
             else: return map(self, args)
-        elif kwargs: return {link.name : link(**kwargs) for link in self.link}
+        elif kwargs: return self.logic(**kwargs)
+
+    async def acall(self, *args, **kwargs) -> Any:
+        """
+        The asynchronous counterpart of '__call__'.
+
+        Args:
+            *args: The input to the Chain.
+            **kwargs: Additional keyword arguments are passed to the link.
+
+        Returns:
+            Any: The output of the Chain.
+        """
+        import asyncio
+        if args:
+            if len(args) == 1: 
+                if isinstance(args[0], list): return [*await asyncio.gather(*[self.acall(**inp) for inp in args[0]])]
+                return await self.alogic(args[0], **kwargs)
+            else: return [*await asyncio.gather(*[self.acall(arg) for arg in args])]
+        elif kwargs: return await self.alogic(**kwargs)
 
 class CAT(Link):
     """
+    Concatenates its input with a separator. Keyword arguments are joined across keys, if every keyword argument is a
+    column (list, tuple, NumPy or Arrow-like array) they are joined row-wise and a column of strings is returned.
+
     TODO:
         * This should handle both dicts from fork and lists from pipe
     """
+    __slots__ = ('name', 'description', 'char')
     def __init__(self, char='\n') -> None:
         super().__init__(name='Cat', description='Concatenates the input.')
         self.char = char
 
     def logic(self, *args : Union[List[str], str], **kwargs : Dict[Any, str]) -> Any:
-        if kwargs: return self.char.join(kwargs.values())  
+        if kwargs: 
+            if all(is_column(v) for v in kwargs.values()):
+                columns = {k : as_column(v) for k, v in kwargs.items()}
+                check_lengths(columns)
+                return [*map(self.char.join, zip(*columns.values()))]
+            return self.char.join(kwargs.values())  
         if len(args) == 1: 
-            if isinstance(args[0], dict): return {k : self.char.join(v) for k, v in args[0].items()}
-            else: return self.char.join(args[0])
+            if isinstance(args[0], dict): return {k : self.char.join(as_column(v) if is_column(v) else v) for k, v in args[0].items()}
+            else: return self.char.join(as_column(args[0]) if is_column(args[0]) else args[0])
         else: return [*map(self.logic, args)]
 
 class IndentityLink(Link, Operation):
@@ -0,0 +1,163 @@
+from inspect import Signature
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from lightchain.link import Link, trace
+
+class Step(NamedTuple):
+    """
+    A single stage of a compiled execution plan.
+
+    Attributes:
+        name (str): The name of the Link the step was resolved from.
+        call (callable): The callable invoked for the step, with any Link dispatch already resolved.
+        signature (Signature): The signature of the underlying logic.
+    """
+    name : str
+    call : Callable
+    signature : Signature
+
+def resolve(link : Link) -> Callable:
+    """
+    Resolves the callable a compiled plan should invoke for a Link, bypassing a layer of dispatch where possible.
+
+    Args:
+        link (Link): The Link to resolve.
+
+    Returns:
+        callable: A callable with the same behaviour as calling the Link.
+    """
+    from lightchain.link.ops import SequentialChain, ForkChain
+    if isinstance(link, SequentialChain): return CompiledChain(link)
+    if isinstance(link, ForkChain) and link.executor is None: return fork([(name, resolve(branch)) for name, branch in link.links.items()])
+    if type(link).__call__ is Link.__call__: return link.logic
+    return link
+
+def fork(branches : List[Tuple[str, Callable]]) -> Callable:
+    """
+    Builds the callable for a sequential ForkChain from pre-resolved branches.
+
+    Args:
+        branches (list): Pairs of link names and resolved callables.
+
+    Returns:
+        callable: A callable returning a mapping of link names to their output.
+    """
+    branches = tuple(branches)
+    def call(*args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], list): return [call(**inp) for inp in args[0]]
+        if trace.profiler is not None: return {name : trace.profiler.wrap(branch, name)(*args, **kwargs) for name, branch in branches}
+        return {name : branch(*args, **kwargs) for name, branch in branches}
+    return call
+
+def flatten(chain : Link, steps : Optional[List[Step]] = None, groups : Optional[Dict[int, Tuple[int, Link]]] = None) -> Tuple[List[Step], Dict[int, Tuple[int, Link]]]:
+    """
+    Flattens nested SequentialChains into a single list of steps, recording where each nested chain starts.
+
+    Args:
+        chain (SequentialChain): The chain to flatten.
+        steps (list, optional): Steps to append to, used when flattening nested chains. Defaults to None.
+        groups (dict, optional): Nested chains to record into, used when flattening nested chains. Defaults to None.
+
+    Returns:
+        tuple: The steps of the chain in execution order and a mapping of the index of the first step of each nested
+            chain to the index after its last step and the chain, outermost chains taking precedence.
+    """
+    from lightchain.link.ops import SequentialChain
+    if steps is None: steps, groups = [], {}
+    for link in chain.links.values():
+        if isinstance(link, SequentialChain):
+            start = len(steps)
+            flatten(link, steps, groups)
+            groups[start] = (len(steps), link)
+        else: steps.append(Step(link.name, resolve(link), link.signature))
+    return steps, groups
+
+class CompiledChain(Link):
+    """
+    A flat execution plan for a SequentialChain. Nested SequentialChains are inlined, ForkChains without an executor
+    become a single step over their compiled branches and each Link is resolved to the callable which does the work,
+    so per-call overhead does not grow with the nesting of the operator tree.
+
+    A compiled plan gives the same output as the chain it was compiled from. Stages are applied to every value of a
+    dict output, as SequentialChain does, and a nested chain reached by a dict is applied to each value as a whole from
+    its own compiled plan, so stages within it which return dicts are mapped over as they would be uncompiled. The
+    routing mode of the chain, see `SequentialChain.route`, is fixed when the plan is compiled.
+
+    Attributes:
+        chain (SequentialChain): The chain the plan was compiled from, used for asynchronous calls.
+        steps (tuple): The steps of the plan in execution order.
+        routing (str): How dict outputs are passed between steps, 'stage' or 'item'.
+        name (str): The name of the chain the plan was compiled from.
+        description (str): The description of the CompiledChain object.
+
+    Args:
+        chain (SequentialChain): The chain to compile.
+    """
+    __slots__ = ('name', 'description', 'chain', 'steps', 'routing', '_calls', '_groups', '_plans')
+    def __init__(self, chain : Link) -> None:
+        super().__init__(name=chain.name, description='Compiled %s' % chain.name)
+        self.chain = chain
+        self.routing = chain.routing
+        steps, self._groups = flatten(chain)
+        self.steps = tuple(steps)
+        self._calls = tuple(step.call for step in self.steps)
+        # plans for nested chains are only compiled once a dict reaches them
+        self._plans = {}
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def __repr__(self) -> str:
+        return 'CompiledChain(%s)' % ' >> '.join(step.name for step in self.steps)
+
+    def _plan(self, start : int) -> 'CompiledChain':
+        plan = self._plans.get(start)
+        if plan is None: plan = self._plans[start] = CompiledChain(self._groups[start][1])
+        return plan
+
+    def _item(self, value : Any, calls : tuple, start : int, kwargs : dict) -> Any:
+        """
+        Passes a single value through the steps from start on, as 'item' routing does once an output is a dict.
+        Nested chains are run from their own plans, as within them dict outputs are mapped over again.
+        """
+        groups, i, stop = self._groups, start, len(calls)
+        while i < stop:
+            if i in groups: value, i = self._plan(i)(value, **kwargs), groups[i][0]
+            else: value, i = calls[i](value, **kwargs), i + 1
+        return value
+
+    def logic(self, *args, **kwargs) -> Any:
+        """
+        Runs the plan. If only keyword arguments are passed, they are the input to the first step.
+
+        Args:
+            args (Any): The input to the plan.
+            **kwargs: Additional keyword arguments are passed to each step.
+
+        Returns:
+            Any: The output of the plan.
+        """
+        calls = self._calls if trace.profiler is None else tuple(trace.profiler.wrap(step.call, step.name) for step in self.steps)
+        steps = enumerate(calls)
+        if args: out = args[0] if len(args) == 1 else args
+        else: out, kwargs = next(steps)[1](**kwargs), {}
+        for i, call in steps:
+            if isinstance(out, dict):
+                if self.routing == 'item': return {k : self._item(v, calls, i, kwargs) for k, v in out.items()}
+                group = self._groups.get(i)
+                if group is None: out = {k : call(v, **kwargs) for k, v in out.items()}
+                else:
+                    plan = self._plan(i)
+                    out = {k : plan(v, **kwargs) for k, v in out.items()}
+                    for _ in range(group[0] - i - 1): next(steps)
+            else: out = call(out, **kwargs)
+        return out
+
+    def __call__(self, *args, **kwargs) -> Any:
+        if len(args) > 1: return [self.logic(arg, **kwargs) for arg in args]
+        return self.logic(*args, **kwargs)
+
+    async def alogic(self, *args, **kwargs) -> Any:
+        return await self.chain.acall(*args, **kwargs)
+
+    async def acall(self, *args, **kwargs) -> Any:
+        return await self.chain.acall(*args, **kwargs)
@@ -0,0 +1,282 @@
+from collections import Counter, deque
+from functools import partial
+from math import log2
+from os import getpid
+from threading import Lock, get_ident
+from time import perf_counter_ns, thread_time_ns
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+# the active Profiler, chains check this once per call so tracing costs nothing while it is None
+profiler = None
+
+class Span(NamedTuple):
+    """
+    A single call of a Link.
+
+    Attributes:
+        name (str): The name of the Link.
+        start (int): The start of the call in nanoseconds of time.perf_counter_ns.
+        wall (int): The wall time of the call in nanoseconds.
+        cpu (int): The CPU time of the calling thread in nanoseconds, None for asynchronous calls.
+        thread (int): The thread the call ran in, or the task for asynchronous calls.
+        inputs (int): The batch size of the input, the length of a list, array or dict and 1 for any other value.
+        outputs (int): The batch size of the output, 0 if the call raised.
+        error (str): The type of the exception raised, if any.
+    """
+    name : str
+    start : int
+    wall : int
+    cpu : Optional[int]
+    thread : int
+    inputs : int
+    outputs : int
+    error : Optional[str]
+
+def batch_size(value : Any) -> int:
+    if value is None: return 0
+    if isinstance(value, (str, bytes)): return 1
+    try: return len(value)
+    except TypeError: return 1
+
+def input_size(args : tuple, kwargs : dict) -> int:
+    if args: return batch_size(args[0]) if len(args) == 1 else len(args)
+    return max((len(v) for v in kwargs.values() if isinstance(v, (list, tuple))), default=1 if kwargs else 0)
+
+class Histogram(object):
+    """
+    A log-linear histogram of non-negative integers, each power of two is split into `resolution` buckets
+    so percentiles are within about 100 / resolution percent of the true value in constant memory.
+
+    Args:
+        resolution (int, optional): The number of buckets per power of two. Defaults to 16.
+    """
+    def __init__(self, resolution : int = 16) -> None:
+        self.resolution = resolution
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value : int) -> None:
+        self.buckets[int(log2(value) * self.resolution) if value > 0 else -1] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+
+    def percentile(self, q : float) -> float:
+        """
+        Estimates a percentile as the upper bound of the bucket holding it, capped by the maximum.
+
+        Args:
+            q (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The estimated value.
+        """
+        if not self.count: return 0.
+        rank, seen = q / 100 * self.count, 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank: return 0. if bucket < 0 else min(2 ** ((bucket + 1) / self.resolution), self.max)
+        return float(self.max)
+
+    def summary(self, scale : float = 1e-6) -> Dict[str, float]:
+        """
+        Summarises the histogram, by default converting nanoseconds to milliseconds.
+        """
+        if not self.count: return {}
+        return {
+            'total' : self.total * scale,
+            'mean' : self.total / self.count * scale,
+            'min' : self.min * scale,
+            'p50' : self.percentile(50) * scale,
+            'p90' : self.percentile(90) * scale,
+            'p99' : self.percentile(99) * scale,
+            'max' : self.max * scale,
+        }
+
+class LinkStats(object):
+    """
+    Aggregated spans of one Link.
+    """
+    def __init__(self) -> None:
+        self.calls = 0
+        self.items_in = 0
+        self.items_out = 0
+        self.exceptions = Counter()
+        self.wall = Histogram()
+        self.cpu = Histogram()
+
+    def add(self, span : Span) -> None:
+        self.calls += 1
+        self.items_in += span.inputs
+        self.items_out += span.outputs
+        if span.error is not None: self.exceptions[span.error] += 1
+        self.wall.add(span.wall)
+        if span.cpu is not None: self.cpu.add(span.cpu)
+
+    def to_dict(self) -> dict:
+        return {
+            'calls' : self.calls,
+            'errors' : sum(self.exceptions.values()),
+            'exceptions' : dict(self.exceptions),
+            'items_in' : self.items_in,
+            'items_out' : self.items_out,
+            'wall_ms' : self.wall.summary(),
+            'cpu_ms' : self.cpu.summary(),
+        }
+
+class Profiler(object):
+    """
+    Records the wall time, CPU time, batch sizes and exceptions of every Link called by a chain while it is enabled.
+    Spans are aggregated per link name into percentile histograms, optionally kept for export as a Chrome trace
+    (chrome://tracing or Perfetto) and optionally passed to a callback as they are recorded.
+
+    Only one Profiler is active at a time, enabling a Profiler records calls made by chains in every thread.
+    When no Profiler is enabled each chain call checks a single module attribute, so instrumentation can be left in place.
+    Branches of a ForkChain running in a process pool are recorded as part of the fork rather than individually.
+
+    Args:
+        trace (bool, optional): Whether to keep spans for `chrome_trace`. Defaults to False.
+        callback (callable, optional): Called with each Span as it is recorded. Defaults to None.
+        links (Iterable[str], optional): The names of the links to record, all links if None. Defaults to None.
+        max_spans (int, optional): The maximum number of spans kept for tracing, the oldest are dropped first. Defaults to 100000.
+    """
+    def __init__(self,
+                 trace : bool = False,
+                 callback : Optional[Callable[[Span], Any]] = None,
+                 links : Optional[Iterable[str]] = None,
+                 max_spans : int = 100000) -> None:
+        self.callback = callback
+        self.links = set(links) if links is not None else None
+        self.spans = deque(maxlen=max_spans) if trace else None
+        self._stats : Dict[str, LinkStats] = {}
+        self._lock = Lock()
+        self._previous = None
+        self._origin = perf_counter_ns()
+
+    def enable(self) -> 'Profiler':
+        global profiler
+        if profiler is not self: self._previous, profiler = profiler, self
+        return self
+
+    def disable(self) -> None:
+        global profiler
+        if profiler is self: profiler, self._previous = self._previous, None
+
+    def __enter__(self) -> 'Profiler':
+        return self.enable()
+
+    def __exit__(self, *args) -> None:
+        self.disable()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+            if self.spans is not None: self.spans.clear()
+            self._origin = perf_counter_ns()
+
+    def add(self, span : Span) -> None:
+        with self._lock:
+            stats = self._stats.get(span.name)
+            if stats is None: stats = self._stats[span.name] = LinkStats()
+            stats.add(span)
+            if self.spans is not None: self.spans.append(span)
+        if self.callback is not None: self.callback(span)
+
+    def record(self, name : str, call : Callable, *args : Any, **kwargs : Any) -> Any:
+        """
+        Calls a Link and records the call.
+        """
+        out, error = None, None
+        start, cpu = perf_counter_ns(), thread_time_ns()
+        try:
+            out = call(*args, **kwargs)
+            return out
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall, cpu = perf_counter_ns() - start, thread_time_ns() - cpu
+            self.add(Span(name, start, wall, cpu, get_ident(), input_size(args, kwargs), 0 if error else batch_size(out), error))
+
+    async def arecord(self, name : str, call : Callable, *args : Any, **kwargs : Any) -> Any:
+        """
+        Awaits a Link and records the call. CPU time is not recorded as other tasks share the thread.
+        """
+        out, error = None, None
+        start = perf_counter_ns()
+        try:
+            out = await call(*args, **kwargs)
+            return out
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            from asyncio import current_task
+            task = current_task()
+            self.add(Span(name, start, perf_counter_ns() - start, None, id(task) if task else get_ident(), input_size(args, kwargs), 0 if error else batch_size(out), error))
+
+    def wrap(self, link : Any, name : Optional[str] = None) -> Callable:
+        """
+        Wraps a Link, or any callable, so its calls are recorded.
+
+        Args:
+            link (Link or callable): The Link to record.
+            name (str, optional): The name the calls are recorded under. Defaults to the name of the Link.
+
+        Returns:
+            callable: The wrapped Link, or the Link itself if its name is not recorded.
+        """
+        name = name or getattr(link, 'name', getattr(link, '__name__', type(link).__name__))
+        if self.links is not None and name not in self.links: return link
+        return partial(self.record, name, link)
+
+    def awrap(self, link : Any, name : Optional[str] = None) -> Callable:
+        """
+        Gets the `acall` method of a Link wrapped so its calls are recorded.
+        """
+        name = name or link.name
+        if self.links is not None and name not in self.links: return link.acall
+        return partial(self.arecord, name, link.acall)
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Summarises every recorded link.
+
+        Returns:
+            dict: For each link name, the number of calls, errors by exception type, total input and output batch sizes,
+            and wall and CPU time in milliseconds (total, mean, min, p50, p90, p99 and max).
+        """
+        with self._lock: return {name : stats.to_dict() for name, stats in self._stats.items()}
+
+    def chrome_trace(self, path : Optional[str] = None) -> dict:
+        """
+        Exports recorded spans in the Chrome trace event format, requires trace=True.
+
+        Args:
+            path (str, optional): A file to write the trace to as JSON. Defaults to None.
+
+        Returns:
+            dict: The trace.
+        """
+        if self.spans is None: raise ValueError('Spans are only kept by a Profiler created with trace=True.')
+        pid = getpid()
+        with self._lock: spans = list(self.spans)
+        events = [{
+            'name' : span.name,
+            'cat' : 'link',
+            'ph' : 'X',
+            'ts' : (span.start - self._origin) / 1e3,
+            'dur' : span.wall / 1e3,
+            'pid' : pid,
+            'tid' : span.thread,
+            'args' : {'inputs' : span.inputs, 'outputs' : span.outputs, 'cpu_ms' : None if span.cpu is None else span.cpu / 1e6, 'error' : span.error},
+        } for span in spans]
+        trace = {'traceEvents' : events, 'displayTimeUnit' : 'ms'}
+        if path is not None:
+            from json import dump
+            with open(path, 'w') as f: dump(trace, f)
+        return trace
@@ -1,7 +1,8 @@
-from json import loads
 from typing import Optional, List, Any
-from re import findall
+from re import findall, split
+from itertools import repeat
 from lightchain.link import Link
+from lightchain.columns import as_column, as_columns, check_lengths, is_column
 
 class AutoPrompt(Link):
     """
@@ -11,6 +12,7 @@ class AutoPrompt(Link):
         pattern (str): The regex pattern used to parse the prompt.
         prompt (str): The prompt string.
         params (list): The parameters found in the prompt string.
+        compiled (bool): Whether the prompt was compiled into static segments and slots, prompts using format specs, attribute access or escaped braces fall back to str.format.
         name (str): The name of the AutoPrompt object. Default is 'AutoPrompt'.
         description (str): The description of the AutoPrompt object. Default is 'Self Parsing Prompt'.
 
@@ -19,6 +21,7 @@ class AutoPrompt(Link):
         name (str, optional): The name of the AutoPrompt object. Defaults to 'AutoPrompt'.
         description (str, optional): The description of the AutoPrompt object. Defaults to 'Self Parsing Prompt'.
     """
+    __slots__ = ('name', 'description', 'prompt', 'params', 'compiled', '_parts', '_slots', '_layout')
     pattern = r"\{([^}]+)\}"
     def __init__(self, 
                  prompt : str, 
@@ -30,9 +33,60 @@ class AutoPrompt(Link):
         super().__init__(name=name, description=description)
         self.prompt = prompt
         self.params = findall(self.pattern, prompt)
+        self._compile()
+
+    def _compile(self) -> None:
+        """
+        Splits the prompt into static segments with a slot for each parameter, so rendering is a single join.
+        """
+        self.compiled = '{{' not in self.prompt and '}}' not in self.prompt and all(param.isidentifier() for param in self.params)
+        if not self.compiled: return
+        segments = split(self.pattern, self.prompt)[::2]
+        self._parts = [None] * (2 * len(self.params) + 1)
+        self._parts[::2] = segments
+        self._slots = tuple((2 * i + 1, param) for i, param in enumerate(self.params))
+        self._layout = self._parts[:]
+        self._layout[1::2] = self.params
+
+    def render(self, values : dict) -> str:
+        """
+        Renders the prompt for a single set of values.
+
+        Args:
+            values (dict): A mapping of parameter names to values, extra keys are ignored.
+
+        Returns:
+            str: The formatted prompt.
+        """
+        if not self.compiled: return self.prompt.format(**values)
+        parts = self._parts[:]
+        for i, param in self._slots: parts[i] = str(values[param])
+        return ''.join(parts)
+
+    def render_columns(self, columns : dict) -> List[str]:
+        """
+        Renders the prompt for each row of a columnar batch. The batch is rendered column-wise, each column is converted
+        to strings once and joined with the static segments of the prompt, no per-row dicts are built.
+
+        Args:
+            columns (dict): A mapping of parameter names to columns, see `lightchain.columns.is_column`.
+
+        Returns:
+            List[str]: One formatted prompt per row.
+
+        Raises:
+            ValueError: If the columns have different lengths.
+        """
+        columns = {k : as_column(v) for k, v in columns.items()}
+        length = check_lengths(columns)
+        if not self.compiled: return [self.prompt.format(**dict(zip(columns.keys(), row))) for row in zip(*columns.values())]
+        if not self._slots: return [self.prompt] * length
+        parts = [map(str, columns[part]) if i % 2 else repeat(part) for i, part in enumerate(self._layout) if part]
+        return [*map(''.join, zip(*parts))]
     
     @staticmethod
     def from_json(json_str : str) -> 'AutoPrompt':
+        from json import loads
         return loads(json_str, object_hook=lambda x: AutoPrompt(**x))
     
     @staticmethod
@@ -47,13 +101,14 @@ class AutoPrompt(Link):
     
     def __call__(self, *args : Optional[List[dict]], **kwargs : Optional[Any]) -> Optional[List[str]] or str:
         if args:
-            if len(args) == 1: return [self(**inp) for inp in args[0]]
+            if len(args) == 1: 
+                columns = as_columns(args[0])
+                if columns is not None: return self.render_columns(columns)
+                return [*map(self.render, args[0])]
             else: return map(self, args)
         elif kwargs:
-            if all(isinstance(item, list) for item in kwargs.values()):
-                kwarg_combinations = [{k: v[i] for k, v in kwargs.items()} for i in range(len(kwargs[list(kwargs.keys())[0]]))]
-                return [self.prompt.format(**item) for item in kwarg_combinations]
-            else: return self.prompt.format(**kwargs)
+            if all(is_column(item) for item in kwargs.values()): return self.render_columns(kwargs)
+            else: return self.render(kwargs)
         else: return self.prompt
 
 class StructPrompt(Link):
@@ -0,0 +1,38 @@
+from lightchain._lazy import lazy_exports
+
+# public names are imported from their modules on first access, NumPy and FAISS are only loaded by the memories using them
+_EXPORTS = {
+    'Memory' : 'lightchain.retrieve.memory',
+    'DictMemory' : 'lightchain.retrieve.memory',
+    'StringLengthBuffer' : 'lightchain.retrieve.memory',
+    'ConversationMemory' : 'lightchain.retrieve.memory',
+    'get_tokenizer' : 'lightchain.retrieve.tokenizer',
+    'register_tokenizer' : 'lightchain.retrieve.tokenizer',
+    'get_counter' : 'lightchain.retrieve.tokenizer',
+    'WhitespaceCounter' : 'lightchain.retrieve.tokenizer',
+    'TokenizerCounter' : 'lightchain.retrieve.tokenizer',
+    'DocStore' : 'lightchain.retrieve.docstore',
+    'FaissEmbeddingMemory' : 'lightchain.retrieve.faiss',
+    'ShardedFaissMemory' : 'lightchain.retrieve.shard',
+    'BM25Memory' : 'lightchain.retrieve.bm25',
+    'HybridMemory' : 'lightchain.retrieve.hybrid',
+    'RetrievalServer' : 'lightchain.retrieve.remote',
+    'RemoteMemory' : 'lightchain.retrieve.remote',
+}
+
+__all__ = [*_EXPORTS]
+
+# type checkers treat this name as typing.TYPE_CHECKING and read the imports below, at runtime they are skipped so
+# importing lightchain.retrieve does not load NumPy or FAISS
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .memory import Memory, DictMemory, StringLengthBuffer, ConversationMemory
+    from .tokenizer import get_tokenizer, register_tokenizer, get_counter, WhitespaceCounter, TokenizerCounter
+    from .docstore import DocStore
+    from .faiss import FaissEmbeddingMemory
+    from .shard import ShardedFaissMemory
+    from .bm25 import BM25Memory
+    from .hybrid import HybridMemory
+    from .remote import RetrievalServer, RemoteMemory
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
@@ -0,0 +1,220 @@
+from collections import Counter
+from os import makedirs
+from os.path import exists, join
+from threading import Lock
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import json
+import re
+import numpy as np
+from .memory import Memory
+from .docstore import DocStore
+
+FORMAT_VERSION = 1
+TOKEN = re.compile(r'\w+')
+
+def analyze(text : str) -> List[str]:
+    """
+    The default analyzer, lowercased runs of word characters.
+    """
+    return TOKEN.findall(text.lower())
+
+class Postings(NamedTuple):
+    """
+    The inverted index of a BM25Memory. A merge builds new arrays and replaces the whole tuple at once, so a search
+    running alongside it reads either the old or the new index and never a mix of the two.
+    """
+    indptr : np.ndarray
+    indices : np.ndarray
+    tfs : np.ndarray
+    lengths : np.ndarray
+    weights : np.ndarray
+
+class BM25Memory(Memory):
+    """
+    A sparse retrieval memory scoring documents with BM25 over an in-memory inverted index, with no external service.
+
+    Postings are held in a compressed sparse row layout: the postings of term t are indices[indptr[t]:indptr[t + 1]],
+    each holding a document id and its precomputed BM25 weight, so a query is scored by gathering the postings of its
+    terms and summing weights per document in one vectorized step. Documents are kept in a DocStore keyed by their id.
+    New documents are buffered and merged into the postings on the next search, in time linear in the size of the
+    index, see `_build`. Inserts and merges hold a lock,
+    searches only read the current postings, so the memory can be searched from several threads while inserting.
+
+    Attributes:
+        postings (Postings): The current inverted index, excluding documents not yet merged.
+
+    Args:
+        k1 (float, optional): The BM25 term frequency saturation. Defaults to 0.9.
+        b (float, optional): The BM25 document length normalisation. Defaults to 0.4.
+        analyzer (callable, optional): Maps a string to a list of terms. Defaults to lowercased word characters.
+    """
+    def __init__(self, k1 : float = 0.9, b : float = 0.4, analyzer : Optional[Callable[[str], List[str]]] = None, name : str = 'BM25Memory', **kwargs) -> None:
+        super().__init__(name=name, **kwargs)
+        self.k1, self.b = k1, b
+        self.analyzer = analyzer or analyze
+        self.docs = DocStore()
+        self.vocab : Dict[str, int] = {}
+        self.postings = Postings(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), *(np.zeros(0, dtype=np.float32) for _ in range(3)))
+        self._pending = []
+        self._lock = Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop('_lock')
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def insert(self, documents : Union[List[str], str]) -> None:
+        if isinstance(documents, str): documents = [documents]
+        terms, tfs, lengths = [], [], []
+        # term ids are assigned under the lock so concurrent inserts cannot give two terms the same id
+        with self._lock:
+            vocab = self.vocab
+            for document in documents:
+                counts = Counter(self.analyzer(document))
+                terms.append(np.fromiter((vocab.setdefault(term, len(vocab)) for term in counts), dtype=np.int64, count=len(counts)))
+                tfs.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+                lengths.append(sum(counts.values()))
+            ids = self.docs.append(documents)
+            postings = np.fromiter(map(len, terms), dtype=np.int64, count=len(terms))
+            if len(terms): self._pending.append((np.concatenate(terms), np.repeat(ids, postings), np.concatenate(tfs), np.array(lengths, dtype=np.float32)))
+
+    def _build(self) -> Postings:
+        """
+        Merges buffered documents into the postings and recomputes BM25 weights, which depend on the statistics
+        of every document. A merge of m documents into N postings takes O(N + m log m) time, so a search after every
+        small insert rebuilds the whole index each time; insert in batches where possible.
+
+        Returns:
+            Postings: The postings including every document inserted so far.
+        """
+        if not self._pending: return self.postings
+        with self._lock:
+            # another thread may have merged while this one waited for the lock
+            pending, current = self._pending, self.postings
+            if not pending: return current
+            terms = np.repeat(np.arange(len(current.indptr) - 1, dtype=np.int64), np.diff(current.indptr))
+            new_terms, new_docs, new_tfs = (np.concatenate([p[i] for p in pending]) for i in range(3))
+            lengths = np.concatenate([current.lengths, *(p[3] for p in pending)])
+            # only the new postings are sorted, a stable sort by term keeps each postings list in document order and
+            # inserting them after the existing postings of their term merges both in linear time
+            order = np.argsort(new_terms, kind='stable')
+            new_terms = new_terms[order]
+            positions = np.searchsorted(terms, new_terms, side='right')
+            indices = np.insert(current.indices, positions, new_docs[order].astype(np.int32))
+            tfs = np.insert(current.tfs, positions, new_tfs[order])
+            terms = np.insert(terms, positions, new_terms)
+            indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=indptr[1:])
+            self.postings = Postings(indptr, indices, tfs, lengths, self._weigh(indptr, indices, tfs, lengths, terms))
+            self._pending = []
+            return self.postings
+
+    def _weigh(self, indptr : np.ndarray, indices : np.ndarray, tfs : np.ndarray, lengths : np.ndarray, terms : np.ndarray) -> np.ndarray:
+        n, df = len(lengths), np.diff(indptr)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1e-9)) if n else lengths
+        return (idf[terms] * tfs * (self.k1 + 1) / (tfs + norm[indices])).astype(np.float32)
+
+    def score(self, query : str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores every document matching at least one query term.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The ids of matching documents and their scores.
+        """
+        postings = self._build()
+        # terms inserted after this merge have no postings yet
+        size, counts = len(postings.indptr) - 1, Counter(self.analyzer(query))
+        matched = [(t, count) for t, count in ((self.vocab.get(term, size), count) for term, count in counts.items()) if t < size]
+        if not matched: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        slices = [slice(postings.indptr[t], postings.indptr[t + 1]) for t, _ in matched]
+        indices = np.concatenate([postings.indices[s] for s in slices])
+        weights = np.concatenate([postings.weights[s] * count for s, (_, count) in zip(slices, matched)])
+        n = len(postings.lengths)
+        if 8 * len(indices) < n:
+            # few postings, accumulate over the matching documents only
+            ids, inverse = np.unique(indices, return_inverse=True)
+            return ids, np.bincount(inverse, weights=weights, minlength=len(ids))
+        scores = np.bincount(indices, weights=weights, minlength=n)
+        ids = np.flatnonzero(scores)
+        return ids, scores[ids]
+
+    def search(self, query : Union[List[str], str], search_kwargs : Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Searches the memory, returning scores and document ids rather than documents.
+
+        Args:
+            query (str or List[str]): A query or a list of queries.
+            search_kwargs (dict, optional): The number of documents to retrieve as {'k' : 10}. Defaults to 10 documents.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The scores and ids of the top k documents with one row per query, highest first. Ids of -1 pad missing results.
+        """
+        if isinstance(query, str): query = [query]
+        k = (search_kwargs or {}).get('k', 10)
+        scores, indices = np.full((len(query), k), -np.inf, dtype=np.float32), np.full((len(query), k), -1, dtype=np.int64)
+        for i, q in enumerate(query):
+            ids, s = self.score(q)
+            if len(ids) > k:
+                top = np.argpartition(-s, k - 1)[:k]
+                ids, s = ids[top], s[top]
+            order = np.lexsort((ids, -s))
+            scores[i, :len(ids)], indices[i, :len(ids)] = s[order], ids[order]
+        return scores, indices
+
+    def logic(self, query : Union[List[str], str], search_kwargs : Optional[dict] = None) -> Union[List[List[str]], List[str]]:
+        """
+        Searches the memory.
+
+        Args:
+            query (str or List[str]): A query or a list of queries.
+            search_kwargs (dict, optional): The number of documents to retrieve as {'k' : 10}. Defaults to 10 documents.
+
+        Returns:
+            List[str] or List[List[str]]: The documents for a single query, or a list of documents per query.
+        """
+        _, indices = self.search(query, search_kwargs)
+        docs = [[doc for doc in row if doc is not None] for row in self.docs.gather(indices)]
+        return docs[0] if isinstance(query, str) else docs
+
+    def save(self, path : str) -> None:
+        """
+        Saves the postings, their BM25 weights, the vocabulary and documents to a directory.
+
+        Args:
+            path (str): The directory to save to, created if needed.
+        """
+        postings = self._build()
+        makedirs(path, exist_ok=True)
+        for attr in Postings._fields: np.save(join(path, '%s.npy' % attr), getattr(postings, attr))
+        with open(join(path, 'vocab.json'), 'w') as f: json.dump(self.vocab, f)
+        self.docs.save(join(path, 'docs'))
+        with open(join(path, 'meta.json'), 'w') as f: json.dump({'format' : FORMAT_VERSION, 'k1' : self.k1, 'b' : self.b, 'documents' : len(self.docs)}, f, indent=2)
+
+    def load(self, path : str, mmap : bool = False) -> None:
+        """
+        Loads a memory saved with `save`, the saved k1 and b are used. Weights are recomputed if the memory was
+        saved without them.
+
+        Args:
+            path (str): The directory the memory was saved to.
+            mmap (bool, optional): Whether to memory-map the postings, weights and documents read-only. Defaults to False.
+        """
+        with open(join(path, 'meta.json')) as f: meta = json.load(f)
+        if meta.get('format', FORMAT_VERSION) > FORMAT_VERSION:
+            raise ValueError('Memory at %s was saved in format %d, this version reads up to %d' % (path, meta['format'], FORMAT_VERSION))
+        self.k1, self.b = meta['k1'], meta['b']
+        indptr, indices, tfs, lengths = (np.load(join(path, '%s.npy' % attr), mmap_mode='r' if mmap else None) for attr in ('indptr', 'indices', 'tfs', 'lengths'))
+        if exists(join(path, 'weights.npy')): weights = np.load(join(path, 'weights.npy'), mmap_mode='r' if mmap else None)
+        else: weights = self._weigh(indptr, indices, tfs, lengths, np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr)))
+        with open(join(path, 'vocab.json')) as f: vocab = json.load(f)
+        with self._lock:
+            self.vocab, self.docs, self._pending = vocab, DocStore.load(join(path, 'docs'), mmap=mmap), []
+            self.postings = Postings(indptr, indices, tfs, lengths, weights)
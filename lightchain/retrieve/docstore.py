@@ -0,0 +1,186 @@
+from codecs import lookup
+from os import makedirs
+from os.path import join
+from typing import Any, Iterable, List, Union
+import numpy as np
+
+# encodings in which an ASCII document is encoded as its characters, so byte offsets are character offsets
+ASCII_COMPATIBLE = ('utf-8', 'ascii', 'iso8859-1')
+
+class DocStore(object):
+    """
+    A compact append-only document store. Documents are stored as UTF-8 in one contiguous byte buffer with an array
+    of offsets, document i occupying bytes offsets[i] to offsets[i + 1]. Document ids are positions in the store,
+    so a matrix of ids (e.g. from faiss.Index.search) is resolved with a single vectorized offset lookup.
+
+    While every document is ASCII, byte offsets are also character offsets, so the buffer is held decoded as a single
+    str and gathering a document is one slice of it. Appended bytes are merged into the str once they reach an eighth
+    of its size, so appending stays linear overall. The first non-ASCII document, or loading with mmap=True, falls
+    back to decoding each gathered document again.
+
+    The store trades lookup time for memory. Each document costs its encoded size plus 8 bytes rather than a str
+    object and a dict entry (around 100 bytes of overhead per document), and can be memory-mapped and shared between
+    processes. Gathering still allocates a str per document, see `python -m benchmarks.faiss_memory`.
+
+    Attributes:
+        data (bytes, np.ndarray or bytearray): The UTF-8 bytes of every document.
+        offsets (np.ndarray): The start of each document in data followed by the end of the last document.
+
+    Args:
+        encoding (str, optional): The encoding used to store documents. Defaults to 'utf-8'.
+    """
+    def __init__(self, encoding : str = 'utf-8') -> None:
+        self.encoding = encoding
+        # (text, tail): the leading documents decoded while every document is ASCII, otherwise None, and the bytes
+        # after them. Both are replaced together so a gather running during an append reads a consistent pair
+        self._buffers = ('' if lookup(encoding).name in ASCII_COMPATIBLE else None, bytearray())
+        self._offsets = np.zeros(1024, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def data(self) -> Union[bytes, bytearray, np.ndarray]:
+        text, tail = self._buffers
+        return tail if text is None else text.encode(self.encoding) + tail
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets[:self._size + 1]
+
+    @property
+    def nbytes(self) -> int:
+        text, tail = self._buffers
+        return len(text or '') + len(tail) + self.offsets.nbytes
+
+    def _writable(self) -> None:
+        # a memory-mapped store is copied into memory the first time it is appended to
+        text, tail = self._buffers
+        if not isinstance(tail, bytearray): self._buffers = (text, bytearray(tail))
+        if not self._offsets.flags.writeable: self._offsets = np.array(self._offsets)
+
+    def append(self, documents : Iterable[str]) -> np.ndarray:
+        """
+        Appends documents to the store.
+
+        Args:
+            documents (Iterable[str]): The documents to append.
+
+        Returns:
+            np.ndarray: The ids assigned to the documents.
+        """
+        self._writable()
+        encoded = [document.encode(self.encoding) for document in documents]
+        start, n = self._size, len(encoded)
+        if start + n + 1 > len(self._offsets):
+            offsets = np.zeros(max(2 * len(self._offsets), start + n + 1), dtype=np.int64)
+            offsets[:start + 1] = self._offsets[:start + 1]
+            self._offsets = offsets
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+        self._offsets[start + 1:start + n + 1] = self._offsets[start] + np.cumsum(lengths)
+        text, tail = self._buffers
+        if text is not None and not all(map(bytes.isascii, encoded)):
+            text, tail = None, bytearray(text.encode(self.encoding)) + tail
+            self._buffers = (text, tail)
+        tail += b''.join(encoded)
+        if text is not None and 8 * len(tail) >= len(text): self._buffers = (text + tail.decode('ascii'), bytearray())
+        self._size += n
+        return np.arange(start, start + n, dtype=np.int64)
+
+    def truncate(self, size : int) -> None:
+        """
+        Removes every document from position size onwards, e.g. to undo appends whose documents were not indexed.
+
+        Args:
+            size (int): The number of documents to keep.
+        """
+        if size >= self._size: return
+        self._writable()
+        end, (text, tail) = int(self._offsets[size]), self._buffers
+        if text is None: del tail[end:]
+        elif end <= len(text): self._buffers = (text[:end], bytearray())
+        else: del tail[end - len(text):]
+        self._size = size
+
+    def __getitem__(self, i : int) -> str:
+        if i < 0 or i >= self._size: raise IndexError('Document id %d is not in the store of %d documents' % (i, self._size))
+        (text, tail), start, end = self._buffers, int(self._offsets[i]), int(self._offsets[i + 1])
+        if text is None: return bytes(tail[start:end]).decode(self.encoding)
+        if end <= len(text): return text[start:end]
+        return tail[start - len(text):end - len(text)].decode('ascii')
+
+    def gather(self, ids : Union[np.ndarray, List[int]], missing : Any = None) -> list:
+        """
+        Gets the documents for an array of ids, preserving its shape as nested lists.
+        Negative ids, as returned by FAISS when fewer than k results are found, are replaced by `missing`.
+        Offsets are looked up at once, documents are sliced from the decoded text of an ASCII store and otherwise decoded one by one.
+
+        Args:
+            ids (np.ndarray): An array of document ids of any shape.
+            missing (Any, optional): The value returned for negative ids. Defaults to None.
+
+        Returns:
+            list: The documents, nested to match the shape of ids.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if ids.size and ids.max() >= self._size: raise IndexError('Document id %d is not in the store of %d documents' % (ids.max(), self._size))
+        valid = ids >= 0
+        safe = np.where(valid, ids, 0)
+        starts, ends = self._offsets[safe].ravel().tolist(), self._offsets[safe + 1].ravel().tolist()
+        (text, data), encoding = self._buffers, self.encoding
+        if text is not None:
+            split = len(text)
+            if not data: docs = [text[start:end] for start, end in zip(starts, ends)]
+            else: docs = [text[start:end] if end <= split else data[start - split:end - split].decode('ascii') for start, end in zip(starts, ends)]
+        # slicing a bytearray decodes in one step, memory-mapped data is read through a memoryview
+        elif isinstance(data, bytearray): docs = [data[start:end].decode(encoding) for start, end in zip(starts, ends)]
+        else:
+            view = memoryview(data)
+            docs = [str(view[start:end], encoding) for start, end in zip(starts, ends)]
+        if not valid.all():
+            for i in np.flatnonzero(~valid).tolist(): docs[i] = missing
+        if ids.ndim <= 1: return docs if ids.ndim else docs[0]
+        if ids.ndim == 2:
+            k = ids.shape[1]
+            return [docs[i:i + k] for i in range(0, len(docs), k)] if k else [[] for _ in range(ids.shape[0])]
+        out = np.empty(len(docs), dtype=object)
+        out[:] = docs
+        return out.reshape(ids.shape).tolist()
+
+    def save(self, path : str) -> None:
+        """
+        Saves the store to a directory as offsets.npy and data.bin.
+
+        Args:
+            path (str): The directory to save to, created if needed.
+        """
+        makedirs(path, exist_ok=True)
+        np.save(join(path, 'offsets.npy'), self.offsets)
+        text, tail = self._buffers
+        with open(join(path, 'data.bin'), 'wb') as f:
+            if text is not None: f.write(text.encode(self.encoding))
+            f.write(tail)
+
+    @staticmethod
+    def load(path : str, mmap : bool = False, encoding : str = 'utf-8') -> 'DocStore':
+        """
+        Loads a store saved with `save`.
+
+        Args:
+            path (str): The directory the store was saved to.
+            mmap (bool, optional): Whether to memory-map the files read-only instead of reading them, so pages are shared between processes. Defaults to False.
+            encoding (str, optional): The encoding used to store documents. Defaults to 'utf-8'.
+
+        Returns:
+            DocStore: The loaded store.
+        """
+        store = DocStore(encoding=encoding)
+        offsets = np.load(join(path, 'offsets.npy'), mmap_mode='r' if mmap else None)
+        if mmap: store._buffers = (None, np.memmap(join(path, 'data.bin'), dtype=np.uint8, mode='r') if offsets[-1] > 0 else bytearray())
+        else:
+            with open(join(path, 'data.bin'), 'rb') as f: data = f.read()
+            is_ascii = store._buffers[0] is not None and data.isascii()
+            store._buffers = (data.decode('ascii'), bytearray()) if is_ascii else (None, bytearray(data))
+        store._offsets, store._size = offsets, len(offsets) - 1
+        return store
@@ -1,51 +1,349 @@
-from typing import Any, List, Union, Optional
+from itertools import islice
+from os import makedirs
+from os.path import exists, isdir, join
+from queue import Queue, Empty
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, List, Tuple, Union, Optional
+import json
+import logging
 from .memory import Memory
+from .docstore import DocStore
+from lightchain.link.cache import LRUCache, MISS
 import faiss 
 from faiss import index_factory
 import numpy as np
 
+FORMAT_VERSION = 1
+
+def encoder_metadata(encoder : Any) -> Optional[dict]:
+    """
+    Describes an encoder so a saved memory records how its vectors were produced.
+
+    Args:
+        encoder (Any): The encoder.
+
+    Returns:
+        dict: The class of the encoder and, where available, the model it wraps.
+    """
+    if encoder is None: return None
+    # functions and classes are described by themselves, any other object by its class
+    cls = encoder if hasattr(encoder, '__qualname__') else type(encoder)
+    meta = {'class' : '%s.%s' % (cls.__module__, cls.__qualname__)}
+    for attr in ('model_id', 'name_or_path', 'model_name'):
+        value = getattr(encoder, attr, None)
+        if isinstance(value, str): meta[attr] = value
+    return meta
+
 class FaissEmbeddingMemory(Memory):
-    def __init__(self, faiss_object : Union[list, faiss.Index], encoder : Optional[Any], ngpu : int = 0, **kwargs) -> None:
+    """
+    A dense retrieval memory over a FAISS index, documents are kept in a DocStore keyed by their FAISS id.
+
+    Saved memories are a directory bundling the index (index.faiss), the documents (docs/) and metadata describing
+    the index and encoder (meta.json). Loading with mmap=True memory-maps the index and documents read-only,
+    so loading is near instant and processes forked after loading share the same pages.
+    """
+    def __init__(self, faiss_object : Union[list, faiss.Index], encoder : Optional[Any], ngpu : int = 0, query_cache : Union[int, LRUCache, None] = 4096, **kwargs) -> None:
+        """
+        Initializes the FaissEmbeddingMemory object.
+
+        Args:
+            faiss_object (list or faiss.Index): An index, or the arguments of faiss.index_factory.
+            encoder (callable, optional): Maps a list of strings to a matrix of vectors.
+            ngpu (int, optional): The number of GPUs to load the index onto. Defaults to 0.
+            query_cache (int or LRUCache, optional): The number of query vectors to cache, or a cache shared with other memories. 0 or None disables caching. Defaults to 4096.
+        """
         super().__init__(**kwargs)
-        if isinstance(faiss_object, dict): self.index =  index_factory(*faiss_object)
+        if isinstance(faiss_object, (list, tuple)): self.index =  index_factory(*faiss_object)
         else: self.index = faiss_object
         self.encoder = encoder
-        self.id2doc = {}
+        self.docs = DocStore()
         self.resources = [faiss.StandardGpuResources() for _ in range(ngpu)] if ngpu > 0 else None
-        
+        self.metadata = {}
+        self.read_only = False
+        if isinstance(query_cache, int): query_cache = LRUCache(max_size=query_cache) if query_cache > 0 else None
+        self.query_cache = query_cache
+        self._encoder_key = (None, None)
+
     @property
     def max_id(self) -> int:
-        return self.index.ntotal if self.index.is_trained else 0
+        return len(self.docs)
     
-    def load(self, string : str) -> None:
-        index = faiss.read_index(string)
-        if self.resources: faiss.index_cpu_to_gpu_multiple_py(self.resources, index)
-        self.index = index
+    def load(self, string : str, mmap : bool = False) -> None:
+        """
+        Loads a memory saved with `save`. A plain FAISS index file can also be loaded, in which case documents are
+        only available if they were saved alongside it.
+
+        Args:
+            string (str): The directory the memory was saved to, or the path of a FAISS index file.
+            mmap (bool, optional): Whether to memory-map the index and documents read-only instead of reading them into memory. Defaults to False.
+        """
+        if isdir(string):
+            with open(join(string, 'meta.json')) as f: self.metadata = json.load(f)
+            if self.metadata.get('format', FORMAT_VERSION) > FORMAT_VERSION: 
+                raise ValueError('Memory at %s was saved in format %d, this version reads up to %d' % (string, self.metadata['format'], FORMAT_VERSION))
+            if self.metadata.get('encoder') != encoder_metadata(self.encoder):
+                logging.warning(f'Memory at {string} was saved with encoder {self.metadata.get("encoder")}, loading with {encoder_metadata(self.encoder)}')
+            self.index, docs_path = self._read_index(string, mmap), join(string, 'docs')
+        else: self.metadata, self.index, docs_path = {}, self._read_index_file(string, mmap), string + '.docs'
+        self.docs = DocStore.load(docs_path, mmap=mmap) if exists(docs_path) else DocStore()
+        self.read_only = mmap and not self.resources
+
+    def _read_index_file(self, path : str, mmap : bool) -> faiss.Index:
+        flags = (getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY) if mmap else 0
+        index = faiss.read_index(path, flags)
+        if self.resources: index = faiss.index_cpu_to_gpu_multiple_py(self.resources, index)
+        return index
+
+    def _read_index(self, path : str, mmap : bool) -> faiss.Index:
+        """
+        Reads the index from a saved memory directory.
+        """
+        return self._read_index_file(join(path, 'index.faiss'), mmap)
+
+    def _write_index(self, path : str) -> dict:
+        """
+        Writes the index to a memory directory, returning metadata describing it.
+        """
+        index = faiss.index_gpu_to_cpu(self.index) if self.resources else self.index
+        faiss.write_index(index, join(path, 'index.faiss'))
+        return {'index' : type(index).__name__, 'dimension' : index.d, 'ntotal' : index.ntotal}
 
     def insert(self, documents : Union[List[str], str]) -> None:
+        if self.read_only: raise ValueError('Memory was loaded with mmap=True and is read only, load it without mmap to insert documents.')
         if isinstance(documents, str): documents = [documents]
         if isinstance(documents, list): 
             if self.encoder is not None: 
-                vectors = self.encoder(documents)
+                vectors = self._encode(documents)
             else: raise ValueError('No encoder provided, pre-encode documents before inserting them into the memory.')
 
-        ids = np.arange(self.max_id, self.max_id + len(vectors))
-        # create id2doc mapping
-        self.id2doc.update({id : doc for id, doc in zip(ids, documents)})
-        
+        # document ids are positions in the doc store, documents are stored once their vectors are added
+        ids = np.arange(len(self.docs), len(self.docs) + len(documents), dtype=np.int64)
         if not self.index.is_trained:
             self.index.train(vectors)
         self.index.add_with_ids(vectors, ids)
+        self.docs.append(documents)
     
-    def save(self, path : str) -> None:
-        faiss.write_index(self.index, path)
+    def _encode(self, documents : List[str]) -> np.ndarray:
+        return np.ascontiguousarray(self.encoder(documents), dtype=np.float32)
 
-    def logic(self, query : Union[np.array, List[str], str], search_kwargs : dict) -> Union[List[str], str]:
-        if isinstance(query, str): query = [query]
-        if isinstance(query, list): 
-            if self.encoder is not None: 
-                vectors = self.encoder(query)
-            else: raise ValueError('No encoder provided, pre-encode queries before searching.')
-        _, indices = self.index.search(vectors, **search_kwargs)
-        if len(query) == 1: return [self.id2doc[index] for index in indices[0]]
-        else: return [[self.id2doc[index] for index in query_indices] for query_indices in indices]
\ No newline at end of file
+    def _pipeline(self, documents : Iterator[str], batch_size : int, queue_size : int, consume : Callable, log_every : Optional[int]) -> int:
+        """
+        Encodes documents in a background thread while the calling thread consumes the encoded batches,
+        at most queue_size batches are held in memory at once. Documents are added to the doc store by the calling
+        thread once encoded, before consume is called with their ids and vectors.
+        """
+        batches, done, stop = Queue(maxsize=queue_size), object(), Event()
+        def produce():
+            try:
+                while not stop.is_set():
+                    chunk = list(islice(documents, batch_size))
+                    if not chunk: break
+                    batches.put((chunk, self._encode(chunk)))
+                batches.put(done)
+            except BaseException as e: batches.put(e)
+
+        producer = Thread(target=produce, name='FaissEmbeddingMemory-encoder', daemon=True)
+        producer.start()
+        count, logged, start = 0, 0, perf_counter()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is done: break
+                if isinstance(batch, BaseException): raise batch
+                chunk, vectors = batch
+                consume(self.docs.append(chunk), vectors)
+                count += len(chunk)
+                if log_every and count - logged >= log_every:
+                    logging.info(f'Inserted {count} documents, {count / (perf_counter() - start):.0f} docs/sec')
+                    logged = count
+        finally:
+            # stop and unblock the producer if the consumer failed
+            stop.set()
+            while producer.is_alive():
+                try: batches.get_nowait()
+                except Empty: producer.join(0.01)
+        return count
+
+    def insert_stream(self, 
+                      documents : Iterable[str], 
+                      batch_size : int = 1024, 
+                      train_size : int = 65536, 
+                      queue_size : int = 4, 
+                      seed : int = 0,
+                      log_every : Optional[int] = None) -> dict:
+        """
+        Inserts documents from an iterable of any size, encoding in batches in a background thread while earlier batches are added to the index.
+        If the index is untrained it is first trained on a uniform reservoir sample of train_size documents. Iterables which can be 
+        iterated twice (e.g. lists or datasets) are sampled in a first pass over the text, single pass iterators have their vectors 
+        spilled to a temporary file until the index is trained so memory use stays bounded.
+
+        Args:
+            documents (Iterable[str]): The documents to insert.
+            batch_size (int, optional): The number of documents encoded at once. Defaults to 1024.
+            train_size (int, optional): The number of documents sampled to train the index. Defaults to 65536.
+            queue_size (int, optional): The maximum number of encoded batches waiting to be added. Defaults to 4.
+            seed (int, optional): The seed of the reservoir sample. Defaults to 0.
+            log_every (int, optional): Log throughput every time this many documents have been inserted. Defaults to None.
+
+        Returns:
+            dict: The number of documents inserted, the time taken and throughput in docs/sec.
+
+        Raises:
+            Exception: Any error raised while encoding, training or adding, after removing the documents whose vectors were not added from the doc store.
+        """
+        if self.read_only: raise ValueError('Memory was loaded with mmap=True and is read only, load it without mmap to insert documents.')
+        if self.encoder is None: raise ValueError('No encoder provided, pre-encode documents before inserting them into the memory.')
+        start = perf_counter()
+        rng = np.random.default_rng(seed)
+        # the end of the documents whose vectors are in the index, the doc store is truncated to it on failure
+        added = [len(self.docs)]
+        def add(ids, vectors):
+            self.index.add_with_ids(vectors, ids)
+            added[0] = int(ids[-1]) + 1
+        try:
+            if self.index.is_trained: count = self._pipeline(iter(documents), batch_size, queue_size, add, log_every)
+            elif iter(documents) is not documents:
+                sample = []
+                for i, document in enumerate(documents):
+                    if i < train_size: sample.append(document)
+                    else:
+                        j = rng.integers(0, i + 1)
+                        if j < train_size: sample[j] = document
+                self.index.train(np.concatenate([self._encode(sample[i:i + batch_size]) for i in range(0, len(sample), batch_size)]))
+                count = self._pipeline(iter(documents), batch_size, queue_size, add, log_every)
+            else: count = self._spill(documents, batch_size, train_size, queue_size, rng, add, log_every)
+        except BaseException:
+            self.docs.truncate(added[0])
+            raise
+        seconds = perf_counter() - start
+        return {'documents' : count, 'seconds' : seconds, 'docs_per_sec' : count / seconds if seconds else 0.}
+
+    def _spill(self, documents : Iterator[str], batch_size : int, train_size : int, queue_size : int, rng : np.random.Generator, add : Callable, log_every : Optional[int]) -> int:
+        """
+        Encodes a single pass iterator to a temporary file while keeping a reservoir sample of vectors, then trains the index and passes the spilled vectors to add.
+        Documents are in the doc store before the index is trained, `insert_stream` removes them if training or adding fails.
+        """
+        with TemporaryDirectory() as directory:
+            path = join(directory, 'vectors.bin')
+            state = {'seen' : 0, 'first' : None, 'sample' : None}
+            with open(path, 'wb') as f:
+                def spill(ids, vectors):
+                    if state['first'] is None: state['first'], state['sample'] = ids[0], np.empty((train_size, vectors.shape[1]), dtype=np.float32)
+                    f.write(vectors.tobytes())
+                    seen, sample = state['seen'], state['sample']
+                    fill = max(0, min(train_size - seen, len(vectors)))
+                    sample[seen:seen + fill] = vectors[:fill]
+                    if fill < len(vectors):
+                        # algorithm R, vectorized over the rest of the batch
+                        slots = rng.integers(0, np.arange(seen + fill, seen + len(vectors)) + 1)
+                        keep = slots < train_size
+                        sample[slots[keep]] = vectors[fill:][keep]
+                    state['seen'] += len(vectors)
+                count = self._pipeline(iter(documents), batch_size, queue_size, spill, log_every)
+            if not count: return 0
+            self.index.train(state['sample'][:min(count, train_size)])
+            vectors = np.memmap(path, dtype=np.float32, mode='r').reshape(count, -1)
+            for i in range(0, count, batch_size):
+                add(np.arange(state['first'] + i, state['first'] + min(i + batch_size, count), dtype=np.int64), np.ascontiguousarray(vectors[i:i + batch_size]))
+            del vectors
+        return count
+
+    def save(self, path : str, metadata : Optional[dict] = None) -> None:
+        """
+        Saves the index, documents and metadata to a directory.
+
+        Args:
+            path (str): The directory to save to, created if needed.
+            metadata (dict, optional): Additional JSON serialisable metadata to store. Defaults to None.
+        """
+        makedirs(path, exist_ok=True)
+        meta = {**self.metadata, **(metadata or {}), **self._write_index(path)}
+        self.docs.save(join(path, 'docs'))
+        meta.update({
+            'format' : FORMAT_VERSION,
+            'documents' : len(self.docs),
+            'encoder' : encoder_metadata(self.encoder),
+        })
+        with open(join(path, 'meta.json'), 'w') as f: json.dump(meta, f, indent=2)
+
+    @property
+    def encoder_key(self) -> str:
+        """
+        Identifies the current encoder in query cache keys.
+        """
+        encoder, key = self._encoder_key
+        if encoder is not self.encoder:
+            meta = encoder_metadata(self.encoder) or {}
+            key = '%s@%x' % (meta.get('model_id', meta.get('name_or_path', meta.get('class'))), id(self.encoder))
+            self._encoder_key = (self.encoder, key)
+        return key
+
+    def encode_queries(self, queries : List[str]) -> np.ndarray:
+        """
+        Encodes unique queries, reusing cached vectors and encoding every miss in a single call.
+
+        Args:
+            queries (List[str]): The queries, without duplicates.
+
+        Returns:
+            np.ndarray: One vector per query.
+        """
+        if self.encoder is None: raise ValueError('No encoder provided, pre-encode queries before searching.')
+        if self.query_cache is None: return self._encode(queries)
+        encoder_key = self.encoder_key
+        vectors = [self.query_cache.get((encoder_key, q)) for q in queries]
+        misses = [i for i, vector in enumerate(vectors) if vector is MISS]
+        if misses:
+            encoded = self._encode([queries[i] for i in misses])
+            for i, vector in zip(misses, encoded):
+                vectors[i] = vector
+                # rows are views of the whole batch, a copy is cached so evicted rows do not keep the batch alive
+                self.query_cache.set((encoder_key, queries[i]), vector.copy())
+        return np.stack(vectors)
+
+    def _search(self, query : Union[np.array, List[str]], search_kwargs : dict) -> Tuple[np.ndarray, np.ndarray, Optional[List[int]]]:
+        # duplicate string queries are encoded and searched once, inverse maps each query to its unique row
+        if isinstance(query, np.ndarray): vectors, inverse = np.atleast_2d(query).astype(np.float32, copy=False), None
+        else:
+            positions = {}
+            inverse = [positions.setdefault(q, len(positions)) for q in query]
+            vectors = self.encode_queries(list(positions))
+            if len(positions) == len(query): inverse = None
+        distances, indices = self.index.search(vectors, **search_kwargs)
+        return distances, indices, inverse
+
+    def search(self, query : Union[np.array, List[str], str], search_kwargs : dict) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Searches the memory, returning distances and document ids rather than documents.
+
+        Args:
+            query (str, List[str] or np.array): A query, a list of queries, or a vector or matrix of encoded queries.
+            search_kwargs (dict): Keyword arguments of faiss.Index.search, e.g. {'k' : 10}.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The distances and ids of faiss.Index.search with one row per query, ids of -1 pad missing results.
+        """
+        distances, indices, inverse = self._search([query] if isinstance(query, str) else query, search_kwargs)
+        if inverse is not None: distances, indices = distances[inverse], indices[inverse]
+        return distances, indices
+
+    def logic(self, query : Union[np.array, List[str], str], search_kwargs : dict) -> Union[List[List[str]], List[str]]:
+        """
+        Searches the memory. Duplicate queries in a batch are encoded and searched once.
+
+        Args:
+            query (str, List[str] or np.array): A query, a list of queries, or a vector or matrix of encoded queries.
+            search_kwargs (dict): Keyword arguments of faiss.Index.search, e.g. {'k' : 10}.
+
+        Returns:
+            List[str] or List[List[str]]: The documents for a single query (str or vector), or a list of documents per query (list or matrix).
+        """
+        single = isinstance(query, str) or (isinstance(query, np.ndarray) and query.ndim == 1)
+        _, indices, inverse = self._search([query] if isinstance(query, str) else query, search_kwargs)
+        docs = self.docs.gather(indices)
+        # FAISS pads with -1 when fewer than k results are found
+        if (indices < 0).any(): docs = [[doc for doc in row if doc is not None] for row in docs]
+        if inverse is not None: docs = [list(docs[i]) for i in inverse]
+        return docs[0] if single else docs
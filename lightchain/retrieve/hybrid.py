@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+import numpy as np
+from .memory import Memory
+
+def fuse(ids : List[np.ndarray], contributions : List[np.ndarray], k : int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sums the contributions of each document over several ranked lists and keeps the top k per query.
+    Every query is fused at once by keying results on (query, document) rather than looping over queries.
+
+    Args:
+        ids (List[np.ndarray]): The document ids of each ranked list with shape (nq, depth), -1 marking missing results.
+        contributions (List[np.ndarray]): The score each result contributes, matching ids.
+        k (int): The number of documents to keep per query.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The fused scores and ids with shape (nq, k), highest first. Ids of -1 pad missing results.
+    """
+    ids, contributions = np.concatenate(ids, axis=1).astype(np.int64, copy=False), np.concatenate(contributions, axis=1)
+    nq = ids.shape[0]
+    valid = ids >= 0
+    stride = int(ids.max()) + 1 if valid.any() else 1
+    keys, inverse = np.unique(np.nonzero(valid)[0] * stride + ids[valid], return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=contributions[valid], minlength=len(keys))
+    rows, docs = keys // stride, keys % stride
+    order = np.lexsort((-totals, rows))
+    rows, docs, totals = rows[order], docs[order], totals[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, np.arange(nq))[rows]
+    keep = rank < k
+    scores, fused = np.full((nq, k), -np.inf, dtype=np.float32), np.full((nq, k), -1, dtype=np.int64)
+    scores[rows[keep], rank[keep]], fused[rows[keep], rank[keep]] = totals[keep], docs[keep]
+    return scores, fused
+
+def reciprocal_rank_fusion(ids : List[np.ndarray], k : int, weights : Optional[List[float]] = None, rrf_k : int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses ranked lists by reciprocal rank, a document at rank r (from 1) of a list contributes weight / (rrf_k + r).
+
+    Args:
+        ids (List[np.ndarray]): The document ids of each ranked list with shape (nq, depth), best first.
+        k (int): The number of documents to keep per query.
+        weights (List[float], optional): The weight of each list. Defaults to 1 for every list.
+        rrf_k (int, optional): Dampens the contribution of top ranks. Defaults to 60.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The fused scores and ids with shape (nq, k), highest first.
+    """
+    weights = weights or [1.0] * len(ids)
+    contributions = [np.broadcast_to(w / (rrf_k + np.arange(1, i.shape[1] + 1, dtype=np.float64)), i.shape) for i, w in zip(ids, weights)]
+    return fuse(ids, contributions, k)
+
+def normalize(scores : np.ndarray, valid : np.ndarray) -> np.ndarray:
+    """
+    Min-max normalises each row of scores over its valid entries, rows with a single distinct score map to 1.
+    """
+    lo = np.where(valid, scores, np.inf).min(axis=1, keepdims=True)
+    hi = np.where(valid, scores, -np.inf).max(axis=1, keepdims=True)
+    span = hi - lo
+    with np.errstate(invalid='ignore'):
+        return np.where(valid, np.where(span > 0, (scores - lo) / np.where(span > 0, span, 1), 1.0), 0.0)
+
+def score_fusion(scores : List[np.ndarray], ids : List[np.ndarray], k : int, weights : Optional[List[float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses ranked lists by a weighted sum of their min-max normalised scores.
+
+    Args:
+        scores (List[np.ndarray]): The scores of each ranked list with shape (nq, depth), higher is better.
+        ids (List[np.ndarray]): The document ids matching scores, -1 marking missing results.
+        k (int): The number of documents to keep per query.
+        weights (List[float], optional): The weight of each list. Defaults to 1 for every list.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The fused scores and ids with shape (nq, k), highest first.
+    """
+    weights = weights or [1.0] * len(ids)
+    contributions = [w * normalize(s.astype(np.float64), i >= 0) for s, i, w in zip(scores, ids, weights)]
+    return fuse(ids, contributions, k)
+
+class HybridMemory(Memory):
+    """
+    Runs a sparse and a dense memory side by side and fuses their rankings, e.g. a BM25Memory with a FaissEmbeddingMemory.
+    Both memories are searched concurrently for the top depth documents of each query, then fused in one vectorized step
+    by reciprocal rank ('rrf') or a weighted sum of min-max normalised scores ('score').
+
+    Documents must be inserted through the HybridMemory so both memories assign them the same ids.
+
+    Args:
+        sparse (Memory): A memory with a search method returning (scores, ids), higher scores first, e.g. BM25Memory.
+        dense (Memory): A memory with a search method returning FAISS (distances, ids), e.g. FaissEmbeddingMemory.
+        fusion (str, optional): 'rrf' or 'score'. Defaults to 'rrf'.
+        weights (Tuple[float, float], optional): The weights of the sparse and dense rankings. Defaults to (1.0, 1.0).
+        depth (int, optional): The number of documents retrieved from each memory. Defaults to k.
+        rrf_k (int, optional): The reciprocal rank fusion constant. Defaults to 60.
+    """
+    def __init__(self,
+                 sparse : Memory,
+                 dense : Memory,
+                 fusion : str = 'rrf',
+                 weights : Tuple[float, float] = (1.0, 1.0),
+                 depth : Optional[int] = None,
+                 rrf_k : int = 60,
+                 name : str = 'HybridMemory',
+                 **kwargs) -> None:
+        super().__init__(name=name, **kwargs)
+        if fusion not in ('rrf', 'score'): raise ValueError("fusion must be 'rrf' or 'score', got %s" % fusion)
+        self.sparse, self.dense = sparse, dense
+        self.fusion, self.weights, self.depth, self.rrf_k = fusion, list(weights), depth, rrf_k
+        self._pool = None
+
+    @property
+    def docs(self):
+        return self.sparse.docs
+
+    def insert(self, documents : Union[List[str], str]) -> None:
+        if len(self.sparse.docs) != len(self.dense.docs):
+            raise ValueError('Sparse and dense memories hold %d and %d documents, insert documents through the HybridMemory so their ids match.' % (len(self.sparse.docs), len(self.dense.docs)))
+        self.sparse.insert(documents)
+        self.dense.insert(documents)
+
+    def dense_scores(self, distances : np.ndarray) -> np.ndarray:
+        """
+        Orients dense distances so that higher is better.
+        """
+        import faiss
+        return distances if self.dense.index.metric_type == faiss.METRIC_INNER_PRODUCT else -distances
+
+    def search(self, query : Union[List[str], str], search_kwargs : Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Searches both memories and fuses their rankings.
+
+        Args:
+            query (str or List[str]): A query or a list of queries.
+            search_kwargs (dict, optional): The number of documents to retrieve as {'k' : 10}. Defaults to 10 documents.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The fused scores and ids with one row per query, highest first. Ids of -1 pad missing results.
+        """
+        if isinstance(query, str): query = [query]
+        k = (search_kwargs or {}).get('k', 10)
+        depth = {'k' : max(self.depth or k, k)}
+        if self._pool is None: self._pool = ThreadPoolExecutor(max_workers=2)
+        sparse = self._pool.submit(self.sparse.search, query, depth)
+        distances, dense_ids = self.dense.search(query, depth)
+        sparse_scores, sparse_ids = sparse.result()
+        if self.fusion == 'rrf': return reciprocal_rank_fusion([sparse_ids, dense_ids], k, self.weights, self.rrf_k)
+        return score_fusion([sparse_scores, self.dense_scores(distances)], [sparse_ids, dense_ids], k, self.weights)
+
+    def logic(self, query : Union[List[str], str], search_kwargs : Optional[dict] = None) -> Union[List[List[str]], List[str]]:
+        """
+        Searches both memories and returns the fused documents.
+
+        Args:
+            query (str or List[str]): A query or a list of queries.
+            search_kwargs (dict, optional): The number of documents to retrieve as {'k' : 10}. Defaults to 10 documents.
+
+        Returns:
+            List[str] or List[List[str]]: The documents for a single query, or a list of documents per query.
+        """
+        _, indices = self.search(query, search_kwargs)
+        docs = [[doc for doc in row if doc is not None] for row in self.docs.gather(indices)]
+        return docs[0] if isinstance(query, str) else docs
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
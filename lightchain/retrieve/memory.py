@@ -1,6 +1,8 @@
 from abc import abstractmethod
-from typing import Any, List, Tuple, Union
+from bisect import bisect_left
+from typing import Any, List, Optional, Tuple, Union
 from lightchain import Link
+from lightchain.retrieve.tokenizer import get_counter
 import logging
 
 class Memory(Link):
@@ -49,27 +51,46 @@ class DictMemory(Memory):
 class StringLengthBuffer(DictMemory): 
     """
     The StringLengthBuffer class is a concrete implementation of the DictMemory class that buffers strings of a certain length.
+    Each item is tokenized once when it is inserted, its length is stored alongside a running sum of lengths so the context
+    which fits is found with a binary search, and items which can never fit in the context are evicted.
     """
-    def __init__(self, context_length : int, model_id : str, join: str = '\n', essential=None) -> None:
+    def __init__(self, context_length : int, model_id : Optional[str] = None, join: str = '\n', essential=None, tokenizer=None, counter=None) -> None:
         """
-        Initializes the StringLengthBuffer object. It also initializes the tokenizer and checks that the essential text is not too long.
+        Initializes the StringLengthBuffer object. It also initializes the token counter and checks that the essential text is not too long.
+        Tokenizers loaded from a model_id are shared by every buffer in the process, see `lightchain.retrieve.tokenizer`.
 
         Args:
             context_length (int): The maximum length of the buffer in terms of the number of tokens.
-            model_id (str): The identifier of the model used for tokenization.
+            model_id (str, optional): The identifier of the model used for tokenization. Defaults to None.
             join (str, optional): The string used to join the buffered strings when they are retrieved. Defaults to '\n'.
             essential (str, optional): An essential string that is always included in the buffer. Defaults to None.
+            tokenizer (Any, optional): A tokenizer used instead of loading one from model_id. Defaults to None.
+            counter (callable, optional): A callable mapping a list of strings to token counts, e.g. `WhitespaceCounter`, used instead of a tokenizer. Defaults to None.
         """
-        super().__init__(join)
-        from transformers import AutoTokenizer
+        super().__init__()
+        self.JOIN = join
         self.BUFFER['main'] = []
         self.BUFFER['essential'] = essential if essential else ''
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.counter = get_counter(model_id=model_id, tokenizer=tokenizer, counter=counter)
         self._max_length = context_length
-        self._default_length = len(self.tokenizer.encode(self.BUFFER['essential'])) if essential else 0
+        self._default_length = self.count(self.BUFFER['essential']) if essential else 0
+        # _offsets[i] is the number of tokens (plus one per join) before item i, so any suffix length is a subtraction
+        self._offsets = [0]
 
         assert self._default_length <= self._max_length, f'Essential text must be less than {self._max_length} tokens.'
     
+    def count(self, text : str) -> int:
+        """
+        Counts the tokens in a single string.
+
+        Args:
+            text (str): The string to count.
+
+        Returns:
+            int: The number of tokens.
+        """
+        return self.counter([text])[0]
+
     def set_essential(self, text : str) -> None:
         """
         Sets the essential text.
@@ -77,20 +98,40 @@ class StringLengthBuffer(DictMemory):
         Args:
             text (str): The new essential text.
         """
-        assert len(self.tokenizer.encode(text)) <= self._max_length, f'Essential text must be less than {self._max_length} tokens.'
+        length = self.count(text)
+        assert length <= self._max_length, f'Essential text must be less than {self._max_length} tokens.'
         self.BUFFER['essential'] = text
-        self._default_length = len(self.tokenizer.encode(self.BUFFER['essential']))
+        self._default_length = length
 
     def extend_essential(self, text : str) -> None:
         """
-        Sets the essential text.
+        Extends the essential text.
 
         Args:
-            text (str): The new essential text.
-        """
-        if len(self.tokenizer.encode(text + self.JOIN)) + len(self.BUFFER['essential']) <= self.length:
-            logging.WARN(f'Essential text must be less than {self.length} characters. No Change Made')
-        else: self.BUFFER['essential'] += self.join + text
+            text (str): The text to append to the essential text.
+        """
+        essential = self.BUFFER['essential'] + self.JOIN + text if self.BUFFER['essential'] else text
+        length = self.count(essential)
+        if length > self._max_length:
+            logging.warning(f'Essential text must be less than {self._max_length} tokens. No Change Made')
+        else: 
+            self.BUFFER['essential'] = essential
+            self._default_length = length
+
+    def _append(self, items : List[str]) -> None:
+        """
+        Appends items to the main buffer, counting their tokens in one batch and evicting items which can no longer fit.
+        """
+        offsets = self._offsets
+        for length in self.counter(items):
+            offsets.append(offsets[-1] + length + 1)
+        self.BUFFER['main'].extend(items)
+        # an item is only ever included if every newer item is, so once the suffix starting at an item
+        # is longer than the whole context it can never be included again
+        start = bisect_left(offsets, offsets[-1] - self._max_length)
+        if start > 0:
+            del self.BUFFER['main'][:start]
+            del offsets[:start]
 
     def insert(self, item : Any) -> None:
         """
@@ -99,14 +140,14 @@ class StringLengthBuffer(DictMemory):
         Args:
             item (Any): The item to insert into the main buffer.
         """
-        if isinstance(item, list): self.BUFFER['main'].extend(item)
-        else: self.BUFFER['main'].append(item)
+        self._append(item if isinstance(item, list) else [item])
 
     def clear(self) -> None:
         """
         Clears the main buffer.
         """
         self.BUFFER['main'] = []
+        self._offsets = [0]
 
     def get_maximum_context(self, new_string='') -> str:
         """
@@ -118,15 +159,10 @@ class StringLengthBuffer(DictMemory):
         Returns:
             str: The maximum context that can be included in the buffer.
         """
-        essential_len = self._default_length + len(self.tokenizer.encode(new_string))
-        current_len = essential_len
-        for i, item in enumerate(self.BUFFER['main'][::-1]):
-            item_len = len(self.tokenizer.encode(item))
-            if current_len + item_len + 1 > self._max_length:
-                return self.JOIN.join([*self.BUFFER['essential'], *self.BUFFER['main'][:i:-1], new_string])
-            else:
-                current_len += item_len + 1
-        return self.JOIN.join([*self.BUFFER['essential'], *self.BUFFER['main'], new_string])
+        budget = self._max_length - self._default_length - self.count(new_string)
+        start = bisect_left(self._offsets, self._offsets[-1] - budget)
+        essential = [self.BUFFER['essential']] if self.BUFFER['essential'] else []
+        return self.JOIN.join([*essential, *self.BUFFER['main'][start:], new_string])
     
     def logic(self, text : str) -> str:
         return self.get_maximum_context(text)
@@ -136,24 +172,28 @@ class ConversationMemory(StringLengthBuffer):
     The ConversationMemory class is a concrete implementation of the StringLengthBuffer class that buffers a conversation.
     """
     def __init__(self, 
-                 model_id : str,
+                 model_id : Optional[str] = None,
                  input_prefix : str = 'Human:', 
                  output_prefix : str = 'AI:', 
                  context_length : int = 20, 
                  join: str = '\n',
-                 essential : str = None) -> None:
+                 essential : str = None,
+                 tokenizer = None,
+                 counter = None) -> None:
         """
         Initializes the ConversationMemory object.
 
         Args:
-            model_id (str): The identifier of the model used for tokenization.
+            model_id (str, optional): The identifier of the model used for tokenization. Defaults to None.
             input_prefix (str, optional): The prefix for user inputs. Defaults to 'Human:'.
             output_prefix (str, optional): The prefix for AI outputs. Defaults to 'AI:'.
             context_length (int, optional): The maximum length of the buffer in terms of the number of tokens. Defaults to 20.
             join (str, optional): The string used to join the buffered strings when they are retrieved. Defaults to '\n'.
             essential (str, optional): An essential string that is always included in the buffer. Defaults to None.
+            tokenizer (Any, optional): A tokenizer used instead of loading one from model_id. Defaults to None.
+            counter (callable, optional): A callable mapping a list of strings to token counts, used instead of a tokenizer. Defaults to None.
         """
-        super().__init__(context_length=context_length, model_id=model_id, join=join, essential=essential)
+        super().__init__(context_length=context_length, model_id=model_id, join=join, essential=essential, tokenizer=tokenizer, counter=counter)
         self.input_prefix = input_prefix
         self.output_prefix = output_prefix
     
@@ -165,10 +205,8 @@ class ConversationMemory(StringLengthBuffer):
             item (Tuple[Any, Any]): The item to insert into the main buffer.
         """
         user, ai = item 
-        self.BUFFER['main'].append(self.input_prefix + user)
-        self.BUFFER['main'].append(self.output_prefix + ai)
+        self._append([self.input_prefix + user, self.output_prefix + ai])
     
     def insert(self, item : Union[Tuple[Any, Any], List[Tuple[Any, Any]]]) -> None:
-        if isinstance(item, list): 
-            for i in item: self.single_insert(i)
+        if isinstance(item, list): self._append([text for user, ai in item for text in (self.input_prefix + user, self.output_prefix + ai)])
         else: self.single_insert(item)
\ No newline at end of file
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import socket
+import socketserver
+import struct
+from concurrent.futures import Future
+from contextlib import contextmanager
+from itertools import count
+from os import unlink
+from os.path import exists
+from threading import Condition, Lock, Thread
+from typing import Any, List, Optional, Tuple, Union
+import numpy as np
+from lightchain.link.batch import BatchLink
+from .memory import Memory
+
+# frame header: request id, message type, payload length
+HEADER = struct.Struct('!QBQ')
+CALL, INSERT, RESULT, ERROR = 1, 2, 3, 4
+# value tags
+NONE, STRING, STRINGS, NESTED, ARRAY = 0, 1, 2, 3, 4
+
+Address = Union[str, Tuple[str, int]]
+
+class RemoteError(Exception):
+    """
+    Raised by RemoteMemory when the server fails to handle a request.
+    """
+
+def pack_strings(strings : List[str]) -> List[bytes]:
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum(np.fromiter(map(len, encoded), dtype='<u8', count=len(encoded)), out=offsets[1:])
+    return [struct.pack('!I', len(encoded)), offsets.tobytes(), b''.join(encoded)]
+
+def unpack_strings(view : memoryview, offset : int) -> Tuple[List[str], int]:
+    n, = struct.unpack_from('!I', view, offset)
+    offset += 4
+    offsets = np.frombuffer(view, dtype='<u8', count=n + 1, offset=offset).tolist()
+    offset += 8 * (n + 1)
+    strings = [str(view[offset + start:offset + end], 'utf-8') for start, end in zip(offsets, offsets[1:])]
+    return strings, offset + offsets[-1]
+
+def pack_value(value : Any) -> List[Union[bytes, memoryview]]:
+    """
+    Encodes a query or result as a list of buffers. Arrays are sent as their raw memory without copying,
+    strings as a table of offsets followed by their UTF-8 bytes.
+
+    Args:
+        value (Any): None, a string, a list of strings, a list of lists of strings, or a NumPy array.
+
+    Returns:
+        list: The buffers to send.
+    """
+    if value is None: return [bytes([NONE])]
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+        return [bytes([STRING]), struct.pack('!Q', len(data)), data]
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        dtype = value.dtype.str.encode()
+        return [bytes([ARRAY, len(dtype)]), dtype, struct.pack('!B%dQ' % value.ndim, value.ndim, *value.shape), memoryview(value).cast('B')]
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(v, str) for v in value): return [bytes([STRINGS]), *pack_strings(value)]
+        if all(isinstance(v, (list, tuple)) for v in value):
+            counts = np.fromiter(map(len, value), dtype='<u4', count=len(value))
+            return [bytes([NESTED]), struct.pack('!I', len(value)), counts.tobytes(), *pack_strings([s for row in value for s in row])]
+    raise TypeError('Cannot send values of type %s to or from a remote memory' % type(value))
+
+def unpack_value(view : memoryview, offset : int = 0) -> Tuple[Any, int]:
+    """
+    Decodes a value encoded by `pack_value`. Arrays are views of the received buffer rather than copies.
+
+    Args:
+        view (memoryview): The received buffer.
+        offset (int, optional): The position of the value in the buffer. Defaults to 0.
+
+    Returns:
+        Tuple[Any, int]: The value and the position after it.
+    """
+    tag = view[offset]
+    offset += 1
+    if tag == NONE: return None, offset
+    if tag == STRING:
+        n, = struct.unpack_from('!Q', view, offset)
+        return str(view[offset + 8:offset + 8 + n], 'utf-8'), offset + 8 + n
+    if tag == STRINGS: return unpack_strings(view, offset)
+    if tag == NESTED:
+        rows, = struct.unpack_from('!I', view, offset)
+        counts = np.frombuffer(view, dtype='<u4', count=rows, offset=offset + 4)
+        flat, offset = unpack_strings(view, offset + 4 + 4 * rows)
+        bounds = [0, *np.cumsum(counts, dtype=np.int64).tolist()]
+        return [flat[start:end] for start, end in zip(bounds, bounds[1:])], offset
+    if tag == ARRAY:
+        size = view[offset]
+        dtype = np.dtype(bytes(view[offset + 1:offset + 1 + size]).decode())
+        offset += 1 + size
+        ndim = view[offset]
+        shape = struct.unpack_from('!%dQ' % ndim, view, offset + 1)
+        offset += 1 + 8 * ndim
+        n = int(np.prod(shape))
+        return np.frombuffer(view, dtype=dtype, count=n, offset=offset).reshape(shape), offset + n * dtype.itemsize
+    raise ValueError('Unknown value tag %d' % tag)
+
+def send_frame(sock : socket.socket, request_id : int, kind : int, parts : List[Union[bytes, memoryview]]) -> None:
+    parts = [HEADER.pack(request_id, kind, sum(len(part) if isinstance(part, bytes) else part.nbytes for part in parts)), *parts]
+    if hasattr(sock, 'sendmsg'):
+        # scatter/gather send, array buffers are written straight from their memory
+        while parts:
+            sent = sock.sendmsg(parts)
+            while parts and sent >= len(parts[0]):
+                sent -= len(parts[0])
+                parts.pop(0)
+            if parts and sent: parts[0] = memoryview(parts[0])[sent:]
+    else: sock.sendall(b''.join(parts))
+
+def recv_exactly(sock : socket.socket, n : int) -> Optional[bytearray]:
+    buffer = bytearray(n)
+    view, received = memoryview(buffer), 0
+    while received < n:
+        size = sock.recv_into(view[received:], n - received)
+        if not size: return None
+        received += size
+    return buffer
+
+def recv_frame(sock : socket.socket) -> Optional[Tuple[int, int, memoryview]]:
+    header = recv_exactly(sock, HEADER.size)
+    if header is None: return None
+    request_id, kind, length = HEADER.unpack(header)
+    payload = recv_exactly(sock, length) if length else bytearray()
+    if payload is None: return None
+    return request_id, kind, memoryview(payload)
+
+def connect(address : Address) -> socket.socket:
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect(address)
+    return sock
+
+class ReadWriteLock(object):
+    """
+    Allows many readers or a single writer at once. Waiting writers hold back new readers, so a steady stream of
+    searches does not starve inserts.
+    """
+    def __init__(self) -> None:
+        self._condition = Condition()
+        self._readers = 0
+        self._writers = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._writers: self._condition.wait()
+            self._readers += 1
+        try: yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers: self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._writers += 1
+            try:
+                while self._writing or self._readers: self._condition.wait()
+            finally: self._writers -= 1
+            self._writing = True
+        try: yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        memory, lock = self.server.memory, self.server.lock
+        while True:
+            frame = recv_frame(self.request)
+            if frame is None: return
+            request_id, kind, payload = frame
+            try:
+                value, offset = unpack_value(payload)
+                kwargs = json.loads(str(payload[offset:], 'utf-8')) if offset < len(payload) else {}
+                # connections are served by concurrent threads, searches may run together but not during an insert
+                if kind == CALL:
+                    with lock.read(): out = memory(value, **kwargs)
+                elif kind == INSERT:
+                    with lock.write(): out = memory.insert(value, **kwargs)
+                else: raise ValueError('Unknown message type %d' % kind)
+                send_frame(self.request, request_id, RESULT, pack_value(out))
+            except Exception as e:
+                send_frame(self.request, request_id, ERROR, pack_value('%s: %s' % (type(e).__name__, e)))
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class RetrievalServer(object):
+    """
+    Serves a Memory to other processes over a Unix socket or localhost TCP, so many chain workers can share one warm index.
+    Each connection is handled in its own thread, requests on a connection are answered in order. Searches from
+    different connections run concurrently, inserts wait for running searches and hold back new ones until done.
+    Requests call the memory with a query (a string, list of strings or NumPy array) and JSON keyword arguments,
+    e.g. a FaissEmbeddingMemory is called as memory(query, search_kwargs={'k' : 10}).
+
+    Args:
+        memory (Memory): The memory to serve.
+        address (str or Tuple[str, int]): The path of a Unix socket, or a (host, port) pair. Port 0 picks a free port.
+    """
+    def __init__(self, memory : Memory, address : Address) -> None:
+        if isinstance(address, str):
+            if exists(address): unlink(address)
+            self._server = _UnixServer(address, _Handler)
+        else: self._server = _TCPServer(address, _Handler)
+        self._server.memory = memory
+        self._server.lock = ReadWriteLock()
+        self.memory = memory
+        self.address = self._server.server_address
+        self._thread = None
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> 'RetrievalServer':
+        """
+        Starts serving in a background thread.
+        """
+        self._thread = Thread(target=self._server.serve_forever, name='RetrievalServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if isinstance(self.address, str) and exists(self.address): unlink(self.address)
+
+    def __enter__(self) -> 'RetrievalServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+class _Connection(object):
+    """
+    A pipelined connection, requests are sent without waiting and a reader thread matches responses to them by id.
+    """
+    def __init__(self, address : Address) -> None:
+        self.sock = connect(address)
+        self.pending = {}
+        self._ids = count()
+        self._lock = Lock()
+        self._reader = Thread(target=self._read, name='RemoteMemory-reader', daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        try:
+            while True:
+                frame = recv_frame(self.sock)
+                if frame is None: break
+                request_id, kind, payload = frame
+                future = self.pending.pop(request_id)
+                try:
+                    value, _ = unpack_value(payload)
+                    if kind == ERROR: future.set_exception(RemoteError(value))
+                    else: future.set_result(value)
+                except Exception as e: future.set_exception(e)
+        except OSError: pass
+        for future in list(self.pending.values()): future.set_exception(ConnectionError('Connection to retrieval server closed'))
+        self.pending.clear()
+
+    def request(self, kind : int, value : Any, kwargs : dict) -> Future:
+        future = Future()
+        parts = pack_value(value)
+        if kwargs: parts.append(json.dumps(kwargs).encode('utf-8'))
+        with self._lock:
+            request_id = next(self._ids)
+            self.pending[request_id] = future
+            send_frame(self.sock, request_id, kind, parts)
+        return future
+
+    def close(self) -> None:
+        try: self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+        self.sock.close()
+
+class RemoteMemory(Memory):
+    """
+    A Link client for a memory hosted by a RetrievalServer, used in a chain exactly like the memory it connects to.
+    Requests are spread over a pool of connections and pipelined, so many threads or coroutines can share the pool.
+    Single string queries can optionally be coalesced into batched requests, see `lightchain.link.batch.BatchLink`.
+
+    Args:
+        address (str or Tuple[str, int]): The address of the server.
+        pool_size (int, optional): The maximum number of connections. Defaults to 4.
+        max_batch_size (int, optional): If greater than 1, concurrent single string queries are sent together in batches of up to this size. Defaults to 1.
+        max_wait (float, optional): The maximum number of seconds to wait for a batch to fill. Defaults to 0.002.
+        timeout (float, optional): Seconds to wait for a response. Defaults to None.
+        name (str, optional): The name of the RemoteMemory object. Defaults to 'RemoteMemory'.
+    """
+    def __init__(self,
+                 address : Address,
+                 pool_size : int = 4,
+                 max_batch_size : int = 1,
+                 max_wait : float = 0.002,
+                 timeout : Optional[float] = None,
+                 name : str = 'RemoteMemory',
+                 **kwargs) -> None:
+        super().__init__(name=name, **kwargs)
+        self.address = address
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pool = []
+        self._lock = Lock()
+        self._batcher = BatchLink(self, max_batch_size=max_batch_size, max_wait=max_wait) if max_batch_size > 1 else None
+
+    def _connection(self) -> _Connection:
+        with self._lock:
+            self._pool = [connection for connection in self._pool if connection._reader.is_alive()]
+            idle = min(self._pool, key=lambda connection: len(connection.pending), default=None)
+            if idle is None or (idle.pending and len(self._pool) < self.pool_size):
+                idle = _Connection(self.address)
+                self._pool.append(idle)
+            return idle
+
+    def submit(self, kind : int, value : Any, **kwargs : Any) -> Future:
+        return self._connection().request(kind, value, kwargs)
+
+    def insert(self, documents : Union[List[str], str], **kwargs : Any) -> None:
+        self.submit(INSERT, documents, **kwargs).result(self.timeout)
+
+    def _request(self, query : Any, search_kwargs : Optional[dict], kwargs : dict) -> Future:
+        if search_kwargs is not None: kwargs['search_kwargs'] = search_kwargs
+        if self._batcher is not None and isinstance(query, str): return self._batcher.submit(query, **kwargs)
+        return self.submit(CALL, query, **kwargs)
+
+    def logic(self, query : Union[np.ndarray, List[str], str], search_kwargs : Optional[dict] = None, **kwargs : Any) -> Any:
+        return self._request(query, search_kwargs, kwargs).result(self.timeout)
+
+    async def alogic(self, query : Union[np.ndarray, List[str], str], search_kwargs : Optional[dict] = None, **kwargs : Any) -> Any:
+        return await asyncio.wait_for(asyncio.wrap_future(self._request(query, search_kwargs, kwargs)), self.timeout)
+
+    def close(self) -> None:
+        if self._batcher is not None: self._batcher.close()
+        with self._lock:
+            for connection in self._pool: connection.close()
+            self._pool = []
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_pool'], state['_lock'] = [], None
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        self.__dict__.update(state)
+        self._lock = Lock()
@@ -0,0 +1,153 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs
+from os.path import join
+from typing import Any, List, Optional, Tuple, Union
+import faiss
+import numpy as np
+from .faiss import FaissEmbeddingMemory
+
+def merge_topk(distances : np.ndarray, labels : np.ndarray, k : int, descending : bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merges per-shard search results into a global top k for each query with a vectorized partial sort.
+
+    Args:
+        distances (np.ndarray): The distances of every shard's results, concatenated per query with shape (nq, shards * k).
+        labels (np.ndarray): The ids matching distances.
+        k (int): The number of results to keep per query.
+        descending (bool, optional): Whether larger distances are better, as for inner product indexes. Defaults to False.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The merged distances and ids with shape (nq, k), best first.
+    """
+    scores = -distances if descending else distances
+    if scores.shape[1] > k:
+        top = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, top, axis=1)
+        labels = np.take_along_axis(labels, top, axis=1)
+    order = np.argsort(scores, axis=1, kind='stable')
+    scores, labels = np.take_along_axis(scores, order, axis=1), np.take_along_axis(labels, order, axis=1)
+    return (-scores if descending else scores), labels
+
+class ShardedIndex(object):
+    """
+    Presents several FAISS indexes as one, implementing the parts of the faiss.Index interface used by FaissEmbeddingMemory.
+    Vectors are assigned to shards by id, searches run on every shard in parallel on a thread pool (FAISS releases the GIL)
+    and per-shard results are merged into a global top k.
+
+    Args:
+        shards (List[faiss.Index]): The indexes holding each shard, they must share a dimension and metric and support add_with_ids.
+        strategy (str, optional): 'hash' assigns each id by a hash, so every insert batch is spread evenly over the shards. 'range' assigns contiguous blocks of block_size ids to shards in turn, shards are only balanced once the corpus spans many blocks. Defaults to 'hash'.
+        block_size (int, optional): The number of consecutive ids assigned to one shard with the 'range' strategy. Defaults to 65536.
+        max_workers (int, optional): The number of threads used to search shards. Defaults to one per shard.
+    """
+    def __init__(self, shards : List[faiss.Index], strategy : str = 'hash', block_size : int = 65536, max_workers : Optional[int] = None) -> None:
+        if strategy not in ('range', 'hash'): raise ValueError("strategy must be 'range' or 'hash', got %s" % strategy)
+        if len({shard.d for shard in shards}) > 1: raise ValueError('All shards must have the same dimension.')
+        self.shards = shards
+        self.strategy = strategy
+        self.block_size = block_size
+        self.max_workers = max_workers or len(shards)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    @property
+    def d(self) -> int:
+        return self.shards[0].d
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards)
+
+    @property
+    def is_trained(self) -> bool:
+        return all(shard.is_trained for shard in self.shards)
+
+    @property
+    def metric_type(self) -> int:
+        return self.shards[0].metric_type
+
+    def assign(self, ids : np.ndarray) -> np.ndarray:
+        """
+        Gets the shard of each id.
+
+        Args:
+            ids (np.ndarray): The ids.
+
+        Returns:
+            np.ndarray: The shard of each id.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.strategy == 'range': return (ids // self.block_size) % len(self.shards)
+        # splitmix64 finaliser, spreads consecutive ids evenly over shards
+        with np.errstate(over='ignore'):
+            h = ids.astype(np.uint64)
+            h = (h ^ (h >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+            h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+            h = h ^ (h >> np.uint64(31))
+        return (h % np.uint64(len(self.shards))).astype(np.int64)
+
+    def train(self, x : np.ndarray) -> None:
+        [*self._pool.map(lambda shard: shard.is_trained or shard.train(x), self.shards)]
+
+    def add_with_ids(self, x : np.ndarray, ids : np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        assignment = self.assign(ids)
+        def add(i):
+            mask = assignment == i
+            if mask.any(): self.shards[i].add_with_ids(np.ascontiguousarray(x[mask]), ids[mask])
+        [*self._pool.map(add, range(len(self.shards)))]
+
+    def search(self, x : np.ndarray, k : int, **kwargs : Any) -> Tuple[np.ndarray, np.ndarray]:
+        results = [*self._pool.map(lambda shard: shard.search(x, k, **kwargs), self.shards)]
+        distances = np.concatenate([d for d, _ in results], axis=1)
+        labels = np.concatenate([l for _, l in results], axis=1)
+        return merge_topk(distances, labels, k, descending=self.metric_type == faiss.METRIC_INNER_PRODUCT)
+
+class ShardedFaissMemory(FaissEmbeddingMemory):
+    """
+    A FaissEmbeddingMemory split over several FAISS indexes, so inserts and searches use one core per shard.
+    It is used exactly as FaissEmbeddingMemory (insert, insert_stream, save, load and logic(query, search_kwargs)),
+    documents are kept in a single DocStore and vectors are split over the shards by id, see `ShardedIndex`.
+
+    Saved memories hold one index per shard in a shards directory in place of index.faiss.
+
+    Args:
+        faiss_object (list, faiss.Index or List[faiss.Index]): An empty index cloned for each shard, the arguments of faiss.index_factory, or a list of one index per shard.
+        encoder (callable, optional): Maps a list of strings to a matrix of vectors.
+        num_shards (int, optional): The number of shards when a single index or factory arguments are passed. Defaults to 2.
+        strategy (str, optional): How ids are assigned to shards, 'hash' or 'range', see `ShardedIndex`. Defaults to 'hash'.
+        block_size (int, optional): The number of consecutive ids assigned to one shard with the 'range' strategy. Defaults to 65536.
+        max_workers (int, optional): The number of threads used to search shards. Defaults to one per shard.
+        query_cache (int or LRUCache, optional): The number of query vectors to cache. Defaults to 4096.
+    """
+    def __init__(self,
+                 faiss_object : Union[list, faiss.Index, List[faiss.Index]],
+                 encoder : Optional[Any],
+                 num_shards : int = 2,
+                 strategy : str = 'hash',
+                 block_size : int = 65536,
+                 max_workers : Optional[int] = None,
+                 query_cache : Any = 4096,
+                 **kwargs) -> None:
+        shards = faiss_object if isinstance(faiss_object, list) and all(isinstance(shard, faiss.Index) for shard in faiss_object) else None
+        super().__init__(None if shards else faiss_object, encoder, query_cache=query_cache, **kwargs)
+        if shards is None:
+            shards = [self.index] + [faiss.clone_index(self.index) for _ in range(num_shards - 1)] if self.index is not None else []
+        self.strategy, self.block_size, self.max_workers = strategy, block_size, max_workers
+        self.index = ShardedIndex(shards, strategy=strategy, block_size=block_size, max_workers=max_workers) if shards else None
+
+    def _read_index(self, path : str, mmap : bool) -> ShardedIndex:
+        strategy, block_size = self.metadata.get('strategy', self.strategy), self.metadata.get('block_size', self.block_size)
+        shards = [self._read_index_file(join(path, 'shards', 'shard_%d.faiss' % i), mmap) for i in range(self.metadata['shards'])]
+        return ShardedIndex(shards, strategy=strategy, block_size=block_size, max_workers=self.max_workers)
+
+    def _write_index(self, path : str) -> dict:
+        makedirs(join(path, 'shards'), exist_ok=True)
+        for i, shard in enumerate(self.index.shards): faiss.write_index(shard, join(path, 'shards', 'shard_%d.faiss' % i))
+        return {
+            'index' : '%s[%s]' % (type(self.index).__name__, type(self.index.shards[0]).__name__),
+            'dimension' : self.index.d,
+            'ntotal' : self.index.ntotal,
+            'shards' : len(self.index.shards),
+            'strategy' : self.index.strategy,
+            'block_size' : self.index.block_size,
+        }
@@ -0,0 +1,133 @@
+from math import ceil
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+from weakref import WeakKeyDictionary
+
+_TOKENIZERS : Dict[str, Any] = {}
+_LOCKS : WeakKeyDictionary = WeakKeyDictionary()
+_LOCK = Lock()
+
+def get_tokenizer(model_id : str) -> Any:
+    """
+    Gets a HuggingFace tokenizer from the process-wide registry, loading it on first use.
+    Each tokenizer is loaded once per process and shared by every memory using the same model_id.
+
+    Args:
+        model_id (str): The identifier of the model used for tokenization.
+
+    Returns:
+        Any: The tokenizer.
+    """
+    tokenizer = _TOKENIZERS.get(model_id)
+    if tokenizer is None:
+        with _LOCK:
+            tokenizer = _TOKENIZERS.get(model_id)
+            if tokenizer is None:
+                from transformers import AutoTokenizer
+                tokenizer = _TOKENIZERS[model_id] = AutoTokenizer.from_pretrained(model_id)
+    return tokenizer
+
+def register_tokenizer(model_id : str, tokenizer : Any) -> None:
+    """
+    Registers an already loaded tokenizer so memories created with model_id share it.
+
+    Args:
+        model_id (str): The identifier of the model used for tokenization.
+        tokenizer (Any): The tokenizer.
+    """
+    with _LOCK: _TOKENIZERS[model_id] = tokenizer
+
+def tokenizer_lock(tokenizer : Any) -> Lock:
+    """
+    Gets the lock serializing calls to a tokenizer, shared by every TokenizerCounter using it. Calling a HuggingFace
+    fast tokenizer sets truncation and padding on its Rust backend, so concurrent calls fail with "Already borrowed".
+
+    Args:
+        tokenizer (Any): The tokenizer.
+
+    Returns:
+        Lock: The lock of the tokenizer, a new lock if the tokenizer cannot be weakly referenced.
+    """
+    with _LOCK:
+        try:
+            lock = _LOCKS.get(tokenizer)
+            if lock is None: lock = _LOCKS[tokenizer] = Lock()
+        except TypeError: lock = Lock()
+    return lock
+
+def clear_tokenizers() -> None:
+    """
+    Removes every tokenizer from the registry.
+    """
+    with _LOCK: _TOKENIZERS.clear()
+
+class TokenCounter(object):
+    """
+    The TokenCounter class is an abstract base class for counting tokens in a batch of strings.
+    Any callable mapping a list of strings to a list of counts can be used in its place.
+    """
+    def __call__(self, texts : List[str]) -> List[int]:
+        raise NotImplementedError
+
+class WhitespaceCounter(TokenCounter):
+    """
+    Approximates token counts by the number of whitespace separated words, without loading a tokenizer.
+
+    Args:
+        ratio (float, optional): The number of tokens counted per word, rounded up. Defaults to 1.0.
+    """
+    def __init__(self, ratio : float = 1.0) -> None:
+        self.ratio = ratio
+
+    def __call__(self, texts : List[str]) -> List[int]:
+        return [ceil(len(text.split()) * self.ratio) for text in texts]
+
+class TokenizerCounter(TokenCounter):
+    """
+    Counts tokens with a tokenizer. HuggingFace tokenizers encode the whole batch in a single call, holding the lock
+    of the tokenizer (see `tokenizer_lock`) so a counter can be shared between threads, any other tokenizer with an
+    encode method is called once per string.
+
+    Args:
+        tokenizer (Any): The tokenizer.
+    """
+    def __init__(self, tokenizer : Any) -> None:
+        self.tokenizer = tokenizer
+        self._batched = hasattr(tokenizer, 'batch_encode_plus')
+        self._lock = tokenizer_lock(tokenizer) if self._batched else None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop('_lock')
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        self.__dict__.update(state)
+        self._lock = tokenizer_lock(self.tokenizer) if self._batched else None
+
+    def __call__(self, texts : List[str]) -> List[int]:
+        if not texts: return []
+        if self._batched:
+            with self._lock: ids = self.tokenizer(texts, return_attention_mask=False)['input_ids']
+            return [*map(len, ids)]
+        return [len(self.tokenizer.encode(text)) for text in texts]
+
+def get_counter(model_id : Optional[str] = None, tokenizer : Any = None, counter : Optional[Callable] = None) -> Callable:
+    """
+    Resolves the token counter for a memory, in order of preference from a counter, a tokenizer or a model_id.
+
+    Args:
+        model_id (str, optional): The identifier of the model whose shared tokenizer is used. Defaults to None.
+        tokenizer (Any, optional): A tokenizer. Defaults to None.
+        counter (callable, optional): A callable mapping a list of strings to a list of token counts. Defaults to None.
+
+    Returns:
+        callable: The token counter.
+
+    Raises:
+        ValueError: If none of the arguments are given.
+    """
+    if counter is not None: return counter
+    if tokenizer is not None: return TokenizerCounter(tokenizer)
+    if model_id is not None: return TokenizerCounter(get_tokenizer(model_id))
+    raise ValueError('One of model_id, tokenizer or counter must be given to count tokens.')
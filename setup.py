@@ -11,6 +11,6 @@ setuptools.setup(
     description="Stupidly Simple Chain Structures",
     requires=requirements,
     url='https://github.com/Parry-Parry/LightChain',
-    packages=setuptools.find_packages(exclude=['tests']),
-    python_requires='>=3.6',
+    packages=setuptools.find_packages(exclude=['tests', 'benchmarks', 'benchmarks.*']),
+    python_requires='>=3.7',
 )
\ No newline at end of file
@@ -0,0 +1,60 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+import numpy as np
+from benchmarks.stubs import corpus
+from lightchain.retrieve.bm25 import BM25Memory
+
+QUERIES = corpus(8, seed=9)
+
+def test_concurrent_first_searches_after_insert():
+    expected = BM25Memory()
+    expected.insert(corpus(2000))
+    expected = expected.search(QUERIES, {'k' : 5})[1].tolist()
+    for _ in range(10):
+        memory = BM25Memory()
+        memory.insert(corpus(2000))
+        with ThreadPoolExecutor(8) as executor:
+            assert all(out == expected for out in executor.map(lambda _: memory.search(QUERIES, {'k' : 5})[1].tolist(), range(8)))
+
+def test_searches_while_inserting():
+    memory, errors, done = BM25Memory(), [], []
+    memory.insert(corpus(200))
+    def search():
+        while not done:
+            try: memory(QUERIES[0])
+            except Exception as e: errors.append(e)
+    threads = [Thread(target=search) for _ in range(4)]
+    for thread in threads: thread.start()
+    with ThreadPoolExecutor(4) as executor: list(executor.map(lambda seed: memory.insert(corpus(50, seed=seed)), range(20)))
+    done.append(True)
+    for thread in threads: thread.join()
+    assert not errors
+    memory.search(QUERIES)
+    assert len(memory.postings.lengths) == len(memory.docs) == 1200
+    assert len(set(memory.vocab.values())) == len(memory.vocab)
+
+def test_pickle():
+    memory = BM25Memory()
+    memory.insert(corpus(100))
+    assert pickle.loads(pickle.dumps(memory)).search(QUERIES)[1].tolist() == memory.search(QUERIES)[1].tolist()
+
+def test_incremental_merges_match_one_build():
+    documents = corpus(600)
+    once, incremental = BM25Memory(), BM25Memory()
+    once.insert(documents)
+    once.search(QUERIES)
+    for i in range(0, len(documents), 75):
+        incremental.insert(documents[i:i + 75])
+        incremental.search(QUERIES)
+    assert once.vocab == incremental.vocab
+    for expected, merged in zip(once.postings, incremental.postings): assert np.array_equal(expected, merged)
+
+def test_load_memory_maps_weights(tmp_path):
+    memory = BM25Memory()
+    memory.insert(corpus(300))
+    memory.save(str(tmp_path))
+    loaded = BM25Memory()
+    loaded.load(str(tmp_path), mmap=True)
+    assert all(isinstance(array, np.memmap) for array in loaded.postings)
+    assert loaded.search(QUERIES)[1].tolist() == memory.search(QUERIES)[1].tolist()
@@ -0,0 +1,103 @@
+import pickle
+from threading import Lock
+import pytest
+from lightchain import AutoPrompt, Link, chainable
+from lightchain.link.cache import CacheLink, LRUCache, SQLiteCache, link_identity, make_key
+from lightchain.retrieve.bm25 import BM25Memory
+
+def add(x : int) -> int:
+    return x + 1
+
+def mul(x : int) -> int:
+    return x * 3
+
+@chainable(name='model', call='generate', cache=True)
+class Model(object):
+    def __init__(self, model : str) -> None:
+        self.model = model
+
+    def generate(self, prompt : str) -> str:
+        return '%s says %s' % (self.model, prompt)
+
+class Locked(Link):
+    def __init__(self) -> None:
+        super().__init__(name='locked', lock=Lock())
+
+    def logic(self, x : str) -> str:
+        return x
+
+def test_functions_sharing_a_cache():
+    cache = LRUCache()
+    assert chainable(add, cache=cache)(2) == 3
+    assert chainable(mul, cache=cache)(2) == 6
+    assert chainable(add, cache=cache)(2) == 3
+    assert cache.stats == {'hits' : 1, 'misses' : 2, 'evictions' : 0}
+
+def test_lambdas_and_closures_sharing_a_cache():
+    cache = LRUCache()
+    def scale(factor):
+        return lambda x: x * factor
+    assert chainable(scale(2), cache=cache)(5) == 10
+    assert chainable(scale(3), cache=cache)(5) == 15
+    assert chainable(lambda x: x - 1, cache=cache)(5) == 4
+
+def test_bound_options_are_part_of_the_identity():
+    cache = LRUCache()
+    def power(x, exponent):
+        return x ** exponent
+    assert chainable(power, cache=cache, exponent=2)(3) == 9
+    assert chainable(power, cache=cache, exponent=3)(3) == 27
+
+def test_instances_of_a_wrapped_class():
+    mistral, llama = Model(model='mistral'), Model(model='llama')
+    assert mistral('hi') == 'mistral says hi'
+    assert llama('hi') == 'llama says hi'
+    assert link_identity(mistral) != link_identity(llama)
+    assert link_identity(Model(model='mistral')) == link_identity(mistral)
+
+def test_instances_sharing_a_persistent_cache(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    wrapped = chainable(Model.__wrapped__, call='generate', cache=SQLiteCache(path))
+    assert wrapped(model='mistral')('hi') == 'mistral says hi'
+    assert wrapped(model='llama')('hi') == 'llama says hi'
+    reopened = chainable(Model.__wrapped__, call='generate', cache=SQLiteCache(path))
+    assert reopened(model='llama')('hi') == 'llama says hi'
+    assert reopened(model='mistral')('hi') == 'mistral says hi'
+
+def test_cache_link_of_chainable_links():
+    cache = LRUCache()
+    assert CacheLink(chainable(add), cache=cache)(2) == 3
+    assert CacheLink(chainable(mul), cache=cache)(2) == 6
+
+def test_sqlite_cache_max_size(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), max_size=4, recount=3)
+    for i in range(10): cache.set(str(i), i)
+    cache.set('9', 9)
+    assert len(cache) == 4
+    assert cache.evictions == 6
+    assert [cache.get(str(i)) for i in range(6, 10)] == [6, 7, 8, 9]
+
+def test_cached_links_pickle_with_their_options():
+    link = pickle.loads(pickle.dumps(chainable(add, name='add', description='adds one')))
+    assert link(1) == 2 and link.name == 'add' and link.description == 'adds one'
+
+def test_links_sharing_a_cache_are_identified_by_state():
+    cache = LRUCache()
+    assert CacheLink(AutoPrompt('A {x}'), cache)(x='1') == 'A 1'
+    assert CacheLink(AutoPrompt('B {x}'), cache)(x='1') == 'B 1'
+    prompt = AutoPrompt('A {x}')
+    prompt.signature
+    assert link_identity(prompt) == link_identity(AutoPrompt('A {x}'))
+    first, second = BM25Memory(), BM25Memory()
+    first.insert('a document')
+    assert link_identity(first) != link_identity(second)
+
+def test_chains_are_identified_by_their_links():
+    upper, lower = chainable(str.upper, name='upper'), chainable(str.lower, name='lower')
+    assert link_identity(upper >> lower) != link_identity(lower >> upper)
+    assert link_identity(upper | lower) == link_identity(chainable(str.upper, name='upper') | chainable(str.lower, name='lower'))
+
+def test_unpicklable_links_and_arguments_raise():
+    with pytest.raises(ValueError): CacheLink(Locked())
+    assert CacheLink(Locked(), namespace='locked')('a') == 'a'
+    with pytest.raises(ValueError): make_key('identity', (Lock(),), {})
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from benchmarks.stubs import corpus
+from lightchain.retrieve.docstore import DocStore
+
+ASCII = corpus(300, seed=3)
+MIXED = [*ASCII[:100], 'café naïve', *ASCII[100:200], '文書', *ASCII[200:]]
+
+def build(documents, batch_size : int = 7) -> DocStore:
+    store = DocStore()
+    for i in range(0, len(documents), batch_size): store.append(documents[i:i + batch_size])
+    return store
+
+@pytest.mark.parametrize('documents', [ASCII, MIXED], ids=['ascii', 'mixed'])
+def test_gather_matches_documents(documents):
+    store = build(documents)
+    ids = np.random.default_rng(0).integers(-1, len(documents), (20, 5))
+    assert store.gather(ids) == [[documents[i] if i >= 0 else None for i in row] for row in ids.tolist()]
+    assert [store[i] for i in range(len(documents))] == documents
+    assert store.data == ''.join(documents).encode('utf-8')
+
+@pytest.mark.parametrize('mmap', [False, True])
+@pytest.mark.parametrize('documents', [ASCII, MIXED], ids=['ascii', 'mixed'])
+def test_save_and_load(tmp_path, documents, mmap):
+    build(documents).save(str(tmp_path))
+    store = DocStore.load(str(tmp_path), mmap=mmap)
+    assert store.gather(np.arange(len(documents))) == documents
+    store.append(['appended é', 'appended'])
+    assert store.gather([len(documents), len(documents) + 1, 0]) == ['appended é', 'appended', documents[0]]
+
+@pytest.mark.parametrize('documents', [ASCII, MIXED], ids=['ascii', 'mixed'])
+def test_truncate(documents):
+    store = build(documents)
+    for size in (250, 150, 3, 0):
+        store.truncate(size)
+        assert len(store) == size and store.gather(np.arange(size)) == documents[:size]
+    store.append(documents[:10])
+    assert store.gather(np.arange(10)) == documents[:10]
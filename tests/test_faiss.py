@@ -0,0 +1,54 @@
+import faiss
+import pytest
+from benchmarks.stubs import HashEncoder, corpus
+from lightchain.retrieve.faiss import FaissEmbeddingMemory
+
+DIMENSION = 16
+
+class Flaky(object):
+    def __init__(self, fail_at : int) -> None:
+        self.encoder, self.calls, self.fail_at = HashEncoder(DIMENSION), 0, fail_at
+
+    def __call__(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_at: raise RuntimeError('encoder down')
+        return self.encoder(texts)
+
+def memory(factory : str, encoder=None) -> FaissEmbeddingMemory:
+    return FaissEmbeddingMemory(faiss.index_factory(DIMENSION, factory, faiss.METRIC_INNER_PRODUCT), encoder or HashEncoder(DIMENSION), query_cache=None)
+
+def expected(documents, queries):
+    flat = memory('IDMap,Flat')
+    flat.insert(documents)
+    return flat(queries, {'k' : 3})
+
+@pytest.mark.parametrize('passes', ['two pass', 'single pass'])
+def test_insert_stream_trains_and_inserts(passes):
+    documents, queries = corpus(1000), corpus(4, seed=7)
+    ivf = memory('IVF4,Flat')
+    stream = documents if passes == 'two pass' else iter(documents)
+    assert ivf.insert_stream(stream, batch_size=100, train_size=200)['documents'] == 1000
+    assert len(ivf.docs) == ivf.index.ntotal == 1000
+    ivf.index.nprobe = 4
+    assert ivf(queries, {'k' : 3}) == expected(documents, queries)
+
+@pytest.mark.parametrize('passes', ['two pass', 'single pass'])
+def test_failed_training_leaves_no_documents(passes):
+    documents = corpus(500)
+    ivf = memory('IVF64,Flat')
+    with pytest.raises(RuntimeError): ivf.insert_stream(documents if passes == 'two pass' else iter(documents), batch_size=100, train_size=10)
+    assert len(ivf.docs) == ivf.index.ntotal == 0
+
+def test_failed_encoding_keeps_store_and_index_aligned():
+    flat = memory('IDMap,Flat', Flaky(fail_at=3))
+    flat.insert(corpus(50, seed=1))
+    with pytest.raises(RuntimeError): flat.insert_stream(iter(corpus(1000)), batch_size=100)
+    assert len(flat.docs) == flat.index.ntotal == 150
+    ivf = memory('IVF4,Flat', Flaky(fail_at=4))
+    with pytest.raises(RuntimeError): ivf.insert_stream(iter(corpus(1000)), batch_size=100, train_size=200)
+    assert len(ivf.docs) == ivf.index.ntotal == 0
+
+def test_failed_insert_leaves_no_documents():
+    ivf = memory('IVF64,Flat')
+    with pytest.raises(RuntimeError): ivf.insert(corpus(10))
+    assert len(ivf.docs) == ivf.index.ntotal == 0
@@ -0,0 +1,36 @@
+import pickle
+from lightchain import chainable
+
+@chainable(call='generate')
+class Counter(object):
+    constructed = 0
+
+    def __init__(self, start : int) -> None:
+        Counter.constructed += 1
+        self.count, self.offsets = start, {}
+
+    def generate(self, key : str) -> tuple:
+        self.count += 1
+        return self.count, self.offsets.get(key), Counter.constructed
+
+def build():
+    Counter.constructed = 0
+    first, second = Counter(start=0), Counter(start=10)
+    first.name, second.name = 'first', 'second'
+    first.obj.offsets['a'] = 1
+    return first | second
+
+def test_process_pool_matches_sequential():
+    expected = build()
+    expected = [expected('a') for _ in range(3)]
+    chain = build().parallel('process', max_workers=1)
+    try: assert [chain('a') for _ in range(3)] == expected
+    finally: chain.shutdown()
+
+def test_pickle_keeps_state_set_after_construction():
+    link = Counter(start=0)
+    link.obj.offsets['a'] = 1
+    constructed = Counter.constructed
+    restored = pickle.loads(pickle.dumps(link))
+    assert restored('a') == link('a') == (1, 1, constructed)
+    assert type(restored) is type(link)
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from lightchain import SequentialChain, chainable
+
+def tag(name : str):
+    return chainable(lambda x, **kwargs: ('%s%s' % (x, name)) if not isinstance(x, dict) else '%s(%s)' % (name, sorted(x.items())), name=name)
+
+def shapes():
+    a, b, c, d, x, y = map(tag, 'abcdxy')
+    return {
+        'fork then nested fork' : lambda: (a | b) >> ((x | y) >> c),
+        'fork then nested sequence' : lambda: (a | b) >> (c >> d),
+        'nested fork in middle' : lambda: a >> ((x | y) >> c) >> d,
+        'left deep' : lambda: a >> b >> c >> d,
+        'left deep after fork' : lambda: (a | b) >> c >> ((x | y) >> d),
+        'deeply nested' : lambda: (a | b) >> (c >> ((x | y) >> (d >> a))),
+        'nested ends in fork' : lambda: (a | b) >> (c >> (x | y)) >> d,
+        'fork of nested chains' : lambda: ((a >> (x | y)) | b) >> ((c | d) >> a),
+    }
+
+@pytest.mark.parametrize('routing', ['stage', 'item'])
+@pytest.mark.parametrize('shape', sorted(shapes()))
+def test_compiled_matches_uncompiled(shape, routing):
+    chain = shapes()[shape]().route(routing)
+    compiled = chain.compile()
+    for value in ('_', {'p' : '_', 'q' : '-'}):
+        assert compiled(value) == chain(value)
+    assert compiled('_', sep='!') == chain('_', sep='!')
+    assert asyncio.run(compiled.acall('_')) == chain('_')
+
+def test_nested_chain_after_fork_receives_values():
+    a, b, c, x, y = map(tag, 'abcxy')
+    chain = (a | b) >> ((x | y) >> c)
+    assert chain.compile()('_') == chain('_') == {'a' : {'x' : '_axc', 'y' : '_ayc'}, 'b' : {'x' : '_bxc', 'y' : '_byc'}}
+
+def test_routing_modes_agree():
+    chain = shapes()['deeply nested']()
+    assert chain.compile()('_') == SequentialChain(chain).route('item').compile()('_')
+
+def test_fork_with_executor_is_a_single_step():
+    a, b, c = map(tag, 'abc')
+    chain = (a | b).parallel('thread') >> c
+    assert chain.compile()('_') == chain('_')
+    chain.links[next(iter(chain.links))].shutdown()
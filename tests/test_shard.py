@@ -0,0 +1,27 @@
+import faiss
+import numpy as np
+import pytest
+from benchmarks.stubs import HashEncoder, corpus
+from lightchain.retrieve.faiss import FaissEmbeddingMemory
+from lightchain.retrieve.shard import ShardedFaissMemory
+
+DIMENSION = 16
+
+def test_default_shards_are_balanced():
+    sharded = ShardedFaissMemory([DIMENSION, 'IDMap,Flat', faiss.METRIC_INNER_PRODUCT], HashEncoder(DIMENSION), num_shards=3)
+    for i in range(0, 1000, 100): sharded.insert(corpus(100, seed=i))
+    sizes = [shard.ntotal for shard in sharded.index.shards]
+    assert sum(sizes) == 1000 and min(sizes) > 250
+
+@pytest.mark.parametrize('strategy', ['hash', 'range'])
+def test_merged_topk_matches_single_index(strategy):
+    documents, queries = corpus(1000), corpus(8, seed=7)
+    single = FaissEmbeddingMemory([DIMENSION, 'IDMap,Flat', faiss.METRIC_INNER_PRODUCT], HashEncoder(DIMENSION), query_cache=None)
+    sharded = ShardedFaissMemory([DIMENSION, 'IDMap,Flat', faiss.METRIC_INNER_PRODUCT], HashEncoder(DIMENSION), num_shards=3, strategy=strategy, block_size=64, query_cache=None)
+    single.insert(documents)
+    sharded.insert(documents)
+    assert min(shard.ntotal for shard in sharded.index.shards) > 250
+    distances, ids = sharded.search(queries, {'k' : 10})
+    expected_distances, expected_ids = single.search(queries, {'k' : 10})
+    assert np.allclose(distances, expected_distances) and np.array_equal(ids, expected_ids)
+    assert sharded(queries, {'k' : 10}) == single(queries, {'k' : 10})
@@ -0,0 +1,30 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from lightchain.retrieve.tokenizer import clear_tokenizers, get_counter, register_tokenizer
+
+class Borrowing(object):
+    """
+    Fails on concurrent calls as a HuggingFace fast tokenizer does when its backend is reconfigured mid-call.
+    """
+    def __init__(self) -> None:
+        self.busy = False
+
+    def batch_encode_plus(self) -> None:
+        pass
+
+    def __call__(self, texts, return_attention_mask=True):
+        if self.busy: raise RuntimeError('Already borrowed')
+        self.busy = True
+        sleep(0.0005)
+        self.busy = False
+        return {'input_ids' : [text.split() for text in texts]}
+
+def test_shared_tokenizer_is_called_by_one_thread_at_a_time():
+    register_tokenizer('borrowing', Borrowing())
+    try:
+        counters = [get_counter(model_id='borrowing') for _ in range(4)]
+        with ThreadPoolExecutor(16) as executor:
+            assert all(out == [2, 1] for out in executor.map(lambda i: counters[i % 4](['a b', 'c']), range(200)))
+        assert pickle.loads(pickle.dumps(counters[0]))(['x y z']) == [3]
+    finally: clear_tokenizers()